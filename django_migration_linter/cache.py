@@ -1,27 +1,522 @@
+import gzip
+import json
+import logging
 import os
 import pickle
+import sqlite3
+import tempfile
+import time
 
+from django.db.migrations.state import ProjectState
+
+from . import constants
+
+logger = logging.getLogger("django_migration_linter")
+
+# Version of the format of the cache bundles
+CACHE_BUNDLE_VERSION = 1
+FINDINGS_TABLE = "lint_findings"
+SQL_TABLE = "generated_sql"
+FILE_HASHES_TABLE = "file_hashes"
+CACHE_TABLES = (FINDINGS_TABLE, SQL_TABLE, FILE_HASHES_TABLE)
+# Table of the number of hits and misses of each cache table
+STATS_TABLE = "cache_stats"
+
+
+class Cache(object):
+    """
+    Cache of the errors and warnings found in the migrations, before the linter
+    options select which ones are ignored or handled as errors.
+    It is stored in an SQLite database.
+
+    Entries are looked up one by one and new entries are inserted in one batch
+    when saving. Each entry records when it was last hit, so that the entries
+    which have not been hit for too long, or the least recently hit ones when
+    the cache grows too big, are evicted when saving.
+    The number of hits and misses is recorded as well.
+    """
+
+    table = FINDINGS_TABLE
 
-class Cache(dict):
     def __init__(self, django_folder, database, cache_path):
         self.filename = os.path.join(
             cache_path,
-            "{0}_{1}.pickle".format(django_folder.replace(os.sep, "_"), database),
+            "{0}_{1}.sqlite3".format(django_folder.replace(os.sep, "_"), database),
         )
 
-        if not os.path.exists(os.path.dirname(self.filename)):
-            os.makedirs(os.path.dirname(self.filename))
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
-        super(Cache, self).__init__()
+        self.connection = None
+        self.started_at = time.time()
+        # Entries read from the database
+        self.loaded_entries = {}
+        # Entries seen during the run, which are written when saving
+        self.new_entries = {}
+        # Keys of the loaded entries, whose last hit is updated when saving
+        self.hit_keys = set()
+        self.hits = 0
+        self.misses = 0
 
     def load(self):
-        try:
-            with open(self.filename, "rb") as f:
-                tmp_dict = pickle.load(f)
-                self.update(tmp_dict)
-        except IOError:
-            pass
+        if self.connection is not None:
+            return
+        # Concurrent runs wait for each other's writes instead of failing
+        self.connection = sqlite3.connect(self.filename, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS {0} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_seen REAL NOT NULL"
+                ")".format(self.table)
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS {0}_last_seen ON {0} (last_seen)".format(
+                    self.table
+                )
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS {0} ("
+                "name TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL"
+                ")".format(STATS_TABLE)
+            )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def get(self, key, default=None):
+        if key in self.new_entries:
+            return self.new_entries[key]
+        if key not in self.loaded_entries:
+            self.load()
+            row = self.connection.execute(
+                "SELECT value FROM {0} WHERE key = ?".format(self.table), (key,)
+            ).fetchone()
+            self.loaded_entries[key] = json.loads(row[0]) if row else None
+            if row:
+                self.hits += 1
+                self.hit_keys.add(key)
+            else:
+                self.misses += 1
+        if self.loaded_entries[key] is None:
+            return default
+        return self.loaded_entries[key]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.new_entries[key] = value
+
+    def update(self, entries):
+        self.new_entries.update(entries)
+
+    def items(self):
+        self.load()
+        entries = {
+            key: json.loads(value)
+            for key, value in self.connection.execute(
+                "SELECT key, value FROM {0}".format(self.table)
+            )
+        }
+        entries.update(self.new_entries)
+        return entries.items()
+
+    def __len__(self):
+        self.load()
+        (nb_entries,) = self.connection.execute(
+            "SELECT COUNT(*) FROM {0}".format(self.table)
+        ).fetchone()
+        # The new entries missing from the database, including looked up ones
+        return nb_entries + sum(
+            1 for key in self.new_entries if self.loaded_entries.get(key) is None
+        )
+
+    def clear(self):
+        self.load()
+        with self.connection:
+            self.connection.execute("DELETE FROM {0}".format(self.table))
+        self.loaded_entries.clear()
+        self.new_entries.clear()
 
     def save(self):
-        with open(self.filename, "wb") as f:
-            pickle.dump(self, f, protocol=2)
+        self.load()
+        last_seen = time.time()
+        with self.connection:
+            # Lock the database for writing before the entries are merged,
+            # concurrent runs waiting for each other instead of failing
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO {0} (key, value, last_seen) "
+                "VALUES (?, ?, ?)".format(self.table),
+                (
+                    (key, json.dumps(value), last_seen)
+                    for key, value in self.new_entries.items()
+                ),
+            )
+            self.connection.executemany(
+                "UPDATE {0} SET last_seen = ? WHERE key = ?".format(self.table),
+                (
+                    (last_seen, key)
+                    for key in self.hit_keys
+                    if key not in self.new_entries
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO {0} (name, hits, misses) "
+                "VALUES (?, 0, 0)".format(STATS_TABLE),
+                (self.table,),
+            )
+            self.connection.execute(
+                "UPDATE {0} SET hits = hits + ?, misses = misses + ? "
+                "WHERE name = ?".format(STATS_TABLE),
+                (self.hits, self.misses, self.table),
+            )
+            self.prune()
+        self.loaded_entries.update(self.new_entries)
+        self.new_entries.clear()
+        self.hit_keys.clear()
+        self.hits = self.misses = 0
+
+    def prune(self):
+        evict_entries(self.connection, self.table)
+
+
+class SqlCache(Cache):
+    """
+    SQL statements generated for the migrations, so that they can be analysed
+    again without generating them.
+    Entries are keyed by the key of the SQL (see SqlGenerator.get_sql_key), so
+    the SQL of the versions of a migration on different branches is kept.
+    """
+
+    table = SQL_TABLE
+
+
+class FileHashCache(Cache):
+    """
+    Hashes of the migration files, keyed by their path, along with the size,
+    modification time and inode of the files when they were hashed.
+    """
+
+    table = FILE_HASHES_TABLE
+
+
+def write_file_atomically(filename, content):
+    """
+    Write the content to a temporary file that is then renamed, so that
+    concurrent readers either find the complete file or no file at all.
+    """
+    fd, temp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+def export_cache_bundle(filename, caches):
+    """
+    Write all entries of the caches to a compressed bundle.
+    The entries don't depend on the path of the project, so the bundle can
+    be imported on other machines and in other checkouts.
+    """
+    bundle = {
+        "version": CACHE_BUNDLE_VERSION,
+        "linter_version": constants.__version__,
+        "entries": {cache.table: dict(cache.items()) for cache in caches},
+    }
+    write_file_atomically(filename, gzip.compress(json.dumps(bundle).encode("utf-8")))
+
+
+def import_cache_bundle(filename, caches):
+    """
+    Add the entries of the bundle to the caches, without replacing the
+    entries they already hold. Return the number of imported entries.
+    """
+    try:
+        with gzip.open(filename, "rb") as f:
+            bundle = json.loads(f.read().decode("utf-8"))
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError("Could not read the cache bundle {}: {}".format(filename, e))
+
+    if bundle.get("version") != CACHE_BUNDLE_VERSION:
+        raise ValueError("Unsupported version of the cache bundle {}.".format(filename))
+    if bundle.get("linter_version") != constants.__version__:
+        raise ValueError(
+            "The cache bundle {} was exported by version {} of the linter.".format(
+                filename, bundle.get("linter_version")
+            )
+        )
+
+    nb_imported = 0
+    for cache in caches:
+        for key, value in bundle["entries"].get(cache.table, {}).items():
+            if key not in cache:
+                cache[key] = value
+                nb_imported += 1
+        cache.save()
+    logger.info("Imported %s cache entries from %s", nb_imported, filename)
+    return nb_imported
+
+
+def evict_entries(connection, table):
+    """
+    Delete the entries of the cache table that were not hit for longer than
+    CACHE_MAX_AGE, then the least recently hit entries beyond CACHE_MAX_SIZE
+    bytes of values. Return the number of deleted entries.
+    """
+    nb_deleted = connection.execute(
+        "DELETE FROM {0} WHERE last_seen < ?".format(table),
+        (time.time() - constants.CACHE_MAX_AGE,),
+    ).rowcount
+
+    (size,) = connection.execute(
+        "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {0}".format(table)
+    ).fetchone()
+    if size <= constants.CACHE_MAX_SIZE:
+        return nb_deleted
+
+    keys_to_delete = []
+    size = 0
+    for key, value_size in connection.execute(
+        "SELECT key, LENGTH(value) FROM {0} ORDER BY last_seen DESC".format(table)
+    ).fetchall():
+        size += value_size
+        if size > constants.CACHE_MAX_SIZE:
+            keys_to_delete.append((key,))
+    connection.executemany(
+        "DELETE FROM {0} WHERE key = ?".format(table), keys_to_delete
+    )
+    return nb_deleted + len(keys_to_delete)
+
+
+def remove_legacy_cache_files(cache_path):
+    """
+    Remove the pickle files of the cache format used before the SQLite
+    databases, which are not read anymore. Return their paths.
+    """
+    filenames = [
+        os.path.join(cache_path, filename)
+        for filename in os.listdir(cache_path)
+        if filename.endswith(".pickle")
+    ]
+    for filename in filenames:
+        os.remove(filename)
+    return filenames
+
+
+class CacheFile(object):
+    """
+    Cache database of a Django project and database, as listed in a cache
+    folder, in order to report on it and prune it.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    @staticmethod
+    def list(cache_path):
+        if not os.path.isdir(cache_path):
+            return []
+        return [
+            CacheFile(os.path.join(cache_path, filename))
+            for filename in sorted(os.listdir(cache_path))
+            if filename.endswith(".sqlite3")
+        ]
+
+    @property
+    def size(self):
+        """Size on disk of the database, including its write-ahead log."""
+        return sum(
+            os.path.getsize(filename)
+            for filename in self.get_filenames()
+            if os.path.exists(filename)
+        )
+
+    def get_filenames(self):
+        return [self.filename, self.filename + "-wal", self.filename + "-shm"]
+
+    def connect(self):
+        connection = sqlite3.connect(self.filename, timeout=30)
+        tables = {
+            name
+            for (name,) in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        return connection, tables
+
+    def get_stats(self):
+        """Return the number of entries, hits and misses of the cache."""
+        connection, tables = self.connect()
+        try:
+            entries = hits = misses = 0
+            for table in CACHE_TABLES:
+                if table in tables:
+                    (nb_entries,) = connection.execute(
+                        "SELECT COUNT(*) FROM {0}".format(table)
+                    ).fetchone()
+                    entries += nb_entries
+            if STATS_TABLE in tables:
+                hits, misses = connection.execute(
+                    "SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) "
+                    "FROM {0}".format(STATS_TABLE)
+                ).fetchone()
+        finally:
+            connection.close()
+        return {"entries": entries, "hits": hits, "misses": misses}
+
+    def prune(self):
+        """
+        Evict the entries of the cache that were not hit for too long or
+        beyond its maximum size. The database is deleted once it is empty.
+        Return the number of evicted entries.
+        """
+        connection, tables = self.connect()
+        try:
+            nb_deleted = nb_entries = 0
+            with connection:
+                for table in CACHE_TABLES:
+                    if table in tables:
+                        nb_deleted += evict_entries(connection, table)
+                        (count,) = connection.execute(
+                            "SELECT COUNT(*) FROM {0}".format(table)
+                        ).fetchone()
+                        nb_entries += count
+            if nb_entries:
+                connection.execute("VACUUM")
+        finally:
+            connection.close()
+
+        if not nb_entries:
+            for filename in self.get_filenames():
+                if os.path.exists(filename):
+                    os.remove(filename)
+        return nb_deleted
+
+
+class SharedCache(object):
+    """
+    Cache of the errors and warnings found in the migrations, in a folder
+    shared by many runs, e.g. a network file system or a folder restored
+    from a CI artifact.
+    Each entry is an immutable file named after its key, which is derived
+    from the content of the migrations, in subfolders named after the first
+    characters of the key. Runs hence fill the cache without coordinating.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_filename(self, key):
+        return os.path.join(self.directory, key[:2], "{}.json".format(key))
+
+    def get(self, key, default=None):
+        try:
+            with open(self.get_filename(key), "rb") as f:
+                return json.loads(f.read().decode("utf-8"))
+        except (IOError, ValueError):
+            return default
+
+    def __contains__(self, key):
+        return os.path.exists(self.get_filename(key))
+
+    def __setitem__(self, key, value):
+        filename = self.get_filename(key)
+        if os.path.exists(filename):
+            # Entries never change once written
+            return
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            write_file_atomically(filename, json.dumps(value).encode("utf-8"))
+        except OSError:
+            logger.debug("Could not write the shared cache entry %s", key)
+
+
+class ProjectStateCheckpoints(object):
+    """
+    Project states of the migration graph saved on disk, in order to resume
+    building the state of later migrations from them.
+    Each checkpoint is stored in its own file, named after its key.
+    """
+
+    def __init__(self, cache_path):
+        self.directory = os.path.join(cache_path, "project_states")
+        # Files being written by concurrent runs are not checkpoints yet
+        self.keys = set()
+        if os.path.isdir(self.directory):
+            self.keys = {
+                os.path.splitext(filename)[0]
+                for filename in os.listdir(self.directory)
+                if filename.endswith(".pickle")
+            }
+
+    def get_filename(self, key):
+        return os.path.join(self.directory, "{}.pickle".format(key))
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def load(self, key):
+        try:
+            with open(self.get_filename(key), "rb") as f:
+                state = pickle.load(f)
+            # Record the hit, as the modification time of the file
+            os.utime(self.get_filename(key))
+            return state
+        except (IOError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            logger.debug("Could not load project state checkpoint %s", key)
+            self.keys.discard(key)
+            return None
+
+    def save(self, key, state):
+        # Don't pickle the rendered models, only the model states
+        state = ProjectState(
+            models={k: model.clone() for k, model in state.models.items()},
+            real_apps=state.real_apps,
+        )
+        try:
+            content = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            logger.debug("Could not pickle project state checkpoint %s", key)
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_file_atomically(self.get_filename(key), content)
+        except OSError:
+            logger.debug("Could not save project state checkpoint %s", key)
+            return
+        self.keys.add(key)
+
+    @property
+    def size(self):
+        return sum(os.path.getsize(self.get_filename(key)) for key in self.keys)
+
+    def prune(self):
+        """
+        Delete the checkpoints that were not used for longer than CACHE_MAX_AGE.
+        Return the number of deleted checkpoints.
+        """
+        min_mtime = time.time() - constants.CACHE_MAX_AGE
+        expired_keys = {
+            key
+            for key in self.keys
+            if os.path.getmtime(self.get_filename(key)) < min_mtime
+        }
+        for key in expired_keys:
+            os.remove(self.get_filename(key))
+        self.keys -= expired_keys
+        return len(expired_keys)
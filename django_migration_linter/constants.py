@@ -3,6 +3,13 @@ from appdirs import user_cache_dir
 __version__ = "4.0.0"
 
 DEFAULT_CACHE_PATH = user_cache_dir("django-migration-linter", version=__version__)
+PROJECT_STATE_CHECKPOINT_INTERVAL = 200
+# Maximum number of project states kept in memory when generating SQL
+MAX_PROJECT_STATES = 10
+# Entries of the cache that were not hit for that long (in seconds) are evicted
+CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# Beyond that size (in bytes) of values, the least recently hit entries are evicted
+CACHE_MAX_SIZE = 64 * 1024 * 1024
 
 DJANGO_APPS_WITH_MIGRATIONS = ("admin", "auth", "contenttypes", "sessions")
 EXPECTED_DATA_MIGRATION_ARGS = ("apps", "schema_editor")
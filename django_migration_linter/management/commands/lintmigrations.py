@@ -6,9 +6,10 @@ from importlib import import_module
 
 import toml
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from ...constants import __version__
+from ...cache import CacheFile, ProjectStateCheckpoints, remove_legacy_cache_files
+from ...constants import DEFAULT_CACHE_PATH, __version__
 from ...migration_linter import MessageType, MigrationLinter
 from ..utils import (
     configure_logging,
@@ -93,6 +94,52 @@ class Command(BaseCommand):
         cache_group.add_argument(
             "--no-cache", action="store_true", help="don't use a cache"
         )
+        parser.add_argument(
+            "--shared-cache-path",
+            type=str,
+            help=(
+                "specify a directory shared by many runs, e.g. on CI, in which "
+                "cached linting results are looked up and stored as well"
+            ),
+        )
+        parser.add_argument(
+            "--import-cache",
+            metavar="FILE_PATH",
+            type=str,
+            help="import the cache entries of a bundle before linting",
+        )
+        parser.add_argument(
+            "--export-cache",
+            metavar="FILE_PATH",
+            type=str,
+            help="export the cache entries to a bundle after linting",
+        )
+        parser.add_argument(
+            "--cache-stats",
+            action="store_true",
+            help="show the entries, hit rate and size of the cache files and exit",
+        )
+        parser.add_argument(
+            "--cache-prune",
+            action="store_true",
+            help=(
+                "evict the cache entries that were not hit for too long "
+                "or beyond the maximum cache size, and exit"
+            ),
+        )
+
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="number of processes to lint the migrations in parallel",
+        )
+
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="generate the SQL without connecting to the database",
+        )
 
         incl_excl_group = parser.add_mutually_exclusive_group(required=False)
         incl_excl_group.add_argument(
@@ -150,6 +197,17 @@ class Command(BaseCommand):
 
         configure_logging(options["verbosity"])
 
+        if options["cache_stats"] or options["cache_prune"]:
+            self.manage_cache(
+                options["cache_path"] or DEFAULT_CACHE_PATH,
+                prune=options["cache_prune"],
+            )
+            return
+        if options["no_cache"] and (options["import_cache"] or options["export_cache"]):
+            raise CommandError(
+                "--import-cache and --export-cache can't be used with --no-cache."
+            )
+
         root_path = options["project_root_path"] or os.path.dirname(
             import_module(os.getenv("DJANGO_SETTINGS_MODULE")).__file__
         )
@@ -172,17 +230,69 @@ class Command(BaseCommand):
             all_warnings_as_errors=all_warnings_as_errors,
             no_output=options["verbosity"] == 0,
             analyser_string=options["sql_analyser"],
+            jobs=options["jobs"],
+            offline=options["offline"],
+            shared_cache_path=options["shared_cache_path"],
         )
+        if options["import_cache"]:
+            try:
+                linter.import_cache(options["import_cache"])
+            except ValueError as e:
+                raise CommandError(e)
         linter.lint_all_migrations(
             app_label=options["app_label"],
             migration_name=options["migration_name"],
             git_commit_id=options["git_commit_id"],
             migrations_file_path=options["include_migrations_from"],
         )
+        if options["export_cache"]:
+            linter.export_cache(options["export_cache"])
         linter.print_summary()
         if linter.has_errors:
             sys.exit(1)
 
+    def manage_cache(self, cache_path, prune=False):
+        if not os.path.isdir(cache_path):
+            self.stdout.write("No cache in {}".format(cache_path))
+            return
+
+        if prune:
+            for filename in remove_legacy_cache_files(cache_path):
+                self.stdout.write("{}: deleted".format(filename))
+
+        for cache_file in CacheFile.list(cache_path):
+            if prune:
+                cache_file.prune()
+                if not os.path.exists(cache_file.filename):
+                    self.stdout.write("{}: deleted".format(cache_file.filename))
+                    continue
+            stats = cache_file.get_stats()
+            lookups = stats["hits"] + stats["misses"]
+            hit_rate = "{:.1%}".format(stats["hits"] / lookups) if lookups else "n/a"
+            self.stdout.write(
+                "{}: {} entries, {} bytes, hit rate {} ({} hits, {} misses)".format(
+                    cache_file.filename,
+                    stats["entries"],
+                    cache_file.size,
+                    hit_rate,
+                    stats["hits"],
+                    stats["misses"],
+                )
+            )
+
+        state_checkpoints = ProjectStateCheckpoints(cache_path)
+        if not os.path.isdir(state_checkpoints.directory):
+            return
+        if prune:
+            state_checkpoints.prune()
+        self.stdout.write(
+            "{}: {} entries, {} bytes".format(
+                state_checkpoints.directory,
+                len(state_checkpoints.keys),
+                state_checkpoints.size,
+            )
+        )
+
     @staticmethod
     def read_django_settings(options):
         django_settings_options = dict()
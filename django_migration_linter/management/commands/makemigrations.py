@@ -61,7 +61,7 @@ class Command(MakeMigrationsCommand):
 
         if self.dry_run:
             """
-            Since we rely on the 'sqlmigrate' to lint the migrations, we can only
+            Since we rely on the migration files to generate the SQL, we can only
             lint if the migration files have been generated. Since the 'dry-run'
             option won't generate the files, we cannot lint migrations.
             """
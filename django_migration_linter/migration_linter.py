@@ -5,23 +5,48 @@ import inspect
 import logging
 import os
 import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum, unique
 from subprocess import PIPE, Popen
 
+import django
 from django.conf import settings
-from django.core.management import call_command
 from django.db import DEFAULT_DB_ALIAS, ProgrammingError, connections
 from django.db.migrations import RunPython, RunSQL
-
-from .cache import Cache
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils.functional import cached_property
+
+from . import constants
+from .cache import (
+    Cache,
+    FileHashCache,
+    ProjectStateCheckpoints,
+    SharedCache,
+    SqlCache,
+    export_cache_bundle,
+    import_cache_bundle,
+)
 from .constants import (
     DEFAULT_CACHE_PATH,
     DJANGO_APPS_WITH_MIGRATIONS,
     EXPECTED_DATA_MIGRATION_ARGS,
 )
+from .offline import get_offline_connection
 from .operations import IgnoreMigration
-from .sql_analyser import analyse_sql_statements, get_sql_analyser_class
-from .utils import clean_bytes_to_str, get_migration_abspath, split_migration_path
+from .sql_analyser import (
+    analyse_sql_statements,
+    get_sql_analyser_class,
+    split_sql_statements,
+)
+from .sql_generator import SqlGenerator
+from .utils import (
+    clean_bytes_to_str,
+    get_git_blob_ids,
+    get_migration_abspath,
+    get_migration_paths,
+    split_migration_path,
+)
 
 logger = logging.getLogger("django_migration_linter")
 
@@ -59,6 +84,9 @@ class MigrationLinter(object):
         all_warnings_as_errors=False,
         no_output=False,
         analyser_string=None,
+        jobs=1,
+        offline=False,
+        shared_cache_path=None,
     ):
         # Store parameters and options
         self.django_path = path
@@ -82,23 +110,79 @@ class MigrationLinter(object):
             settings.DATABASES[self.database]["ENGINE"],
             analyser_string=analyser_string,
         )
+        # Re-used to analyse the SQL of every migration
+        self.sql_analyser = self.sql_analyser_class()
+        self.jobs = int(jobs or 1)
+        self.offline = offline
+        if self.offline and (
+            self.only_applied_migrations or self.only_unapplied_migrations
+        ):
+            raise ValueError(
+                "Applied migrations can't be looked up when generating SQL offline."
+            )
+        # Options of the linters analysing migrations in parallel processes
+        self.worker_options = {
+            "path": self.django_path,
+            "database": self.database,
+            "cache_path": self.cache_path,
+            "no_cache": self.no_cache,
+            "analyser_string": analyser_string,
+            "offline": self.offline,
+        }
+        # Migration node -> (errors, warnings) analysed in advance
+        self.analysed_migrations = {}
 
         # Initialise counters
         self.reset_counters()
 
-        # Initialise cache. Read from old, write to new to prune old entries.
+        # Initialise cache
         if self.should_use_cache():
-            self.old_cache = Cache(self.django_path, self.database, self.cache_path)
-            self.new_cache = Cache(self.django_path, self.database, self.cache_path)
-            self.old_cache.load()
+            self.cache = Cache(self.django_path, self.database, self.cache_path)
+            self.sql_cache = SqlCache(self.django_path, self.database, self.cache_path)
+            self.file_hash_cache = FileHashCache(
+                self.django_path, self.database, self.cache_path
+            )
+        self.shared_cache = None
+        if self.should_use_cache() and shared_cache_path:
+            self.shared_cache = SharedCache(shared_cache_path)
+        # (app_label, migration_name) -> hash of the migration file
+        self.migration_hashes = {}
+        # app_label -> {migration_name: path of the migration file}
+        self.migration_paths = {}
 
         # Initialise migrations
         from django.db.migrations.loader import MigrationLoader
 
+        # Like 'sqlmigrate', don't replace squashed migrations so that the SQL
+        # of every migration on disk can be generated from the graph.
+        loader_kwargs = {}
+        if django.VERSION >= (3, 2):
+            loader_kwargs["replace_migrations"] = False
+        # The applied migrations are only looked up when needed,
+        # see the 'applied_migrations' property.
         self.migration_loader = MigrationLoader(
-            connection=connections[self.database], load=True
+            connection=None, load=True, **loader_kwargs
+        )
+        connection = connections[self.database]
+        if self.offline:
+            # Generate the SQL without querying or even connecting to the database
+            connection = get_offline_connection(connection)
+        self.sql_generator = SqlGenerator(
+            self.migration_loader,
+            connection,
+            state_checkpoints=(
+                ProjectStateCheckpoints(self.cache_path)
+                if self.should_use_cache()
+                else None
+            ),
+            sql_cache=self.sql_cache if self.should_use_cache() else None,
+            get_migration_hash=self.hash_migration_file,
         )
 
+    @cached_property
+    def applied_migrations(self):
+        return MigrationRecorder(connections[self.database]).applied_migrations()
+
     def reset_counters(self):
         self.nb_valid = 0
         self.nb_ignored = 0
@@ -109,6 +193,24 @@ class MigrationLinter(object):
     def should_use_cache(self):
         return self.django_path and not self.no_cache
 
+    def export_cache(self, filename):
+        """
+        Export the linting results and the generated SQL of the cache to
+        a bundle that can be imported in other checkouts of the project.
+        """
+        if not self.should_use_cache():
+            raise ValueError("The cache can't be exported when it is not used.")
+        export_cache_bundle(filename, [self.cache, self.sql_cache])
+
+    def import_cache(self, filename):
+        """
+        Import the linting results and the generated SQL of an exported bundle
+        into the cache. Return the number of imported entries.
+        """
+        if not self.should_use_cache():
+            raise ValueError("The cache can't be imported when it is not used.")
+        return import_cache_bundle(filename, [self.cache, self.sql_cache])
+
     def lint_all_migrations(
         self,
         app_label=None,
@@ -134,18 +236,60 @@ class MigrationLinter(object):
             else None
         )
 
+        if app_label and migration_name:
+            sorted_migrations = [
+                m for m in sorted_migrations if m == specific_target_migration
+            ]
+        elif app_label:
+            sorted_migrations = [
+                m for m in sorted_migrations if m.app_label == app_label
+            ]
+
+        if self.should_use_cache():
+            # Compute the keys of the migrations in one walk of the migration graph
+            self.sql_generator.compute_state_keys(
+                [
+                    (m.app_label, m.name)
+                    for m in sorted_migrations
+                    if not self.should_ignore_migration(
+                        m.app_label, m.name, m.operations
+                    )
+                ]
+            )
+
+        nodes_to_analyse = [
+            (m.app_label, m.name)
+            for m in sorted_migrations
+            if self.should_generate_sql(m)
+        ]
+        if self.jobs > 1 and len(nodes_to_analyse) > 1:
+            self.analyse_migrations_in_parallel(nodes_to_analyse)
+        else:
+            # Generate the SQL of the migrations in one walk of the migration graph
+            self.sql_generator.generate(nodes_to_analyse)
+
         for m in sorted_migrations:
-            if app_label and migration_name:
-                if m == specific_target_migration:
-                    self.lint_migration(m)
-            elif app_label:
-                if m.app_label == app_label:
-                    self.lint_migration(m)
-            else:
-                self.lint_migration(m)
+            self.lint_migration(m)
 
         if self.should_use_cache():
-            self.new_cache.save()
+            if self.shared_cache is not None:
+                for key, findings in self.cache.new_entries.items():
+                    self.shared_cache[key] = findings
+            self.cache.save()
+            self.sql_cache.save()
+            self.file_hash_cache.save()
+
+    def should_generate_sql(self, migration):
+        app_label = migration.app_label
+        migration_name = migration.name
+        if self.should_ignore_migration(
+            app_label, migration_name, migration.operations
+        ):
+            return False
+        return not (
+            self.should_use_cache()
+            and self.get_cached_findings(app_label, migration_name) is not None
+        )
 
     def lint_migration(self, migration):
         app_label = migration.app_label
@@ -153,8 +297,6 @@ class MigrationLinter(object):
         operations = migration.operations
         self.nb_total += 1
 
-        md5hash = self.get_migration_hash(app_label, migration_name)
-
         if self.should_ignore_migration(app_label, migration_name, operations):
             self.print_linting_msg(
                 app_label, migration_name, "IGNORE", MessageType.IGNORE
@@ -162,24 +304,61 @@ class MigrationLinter(object):
             self.nb_ignored += 1
             return
 
-        if self.should_use_cache() and md5hash in self.old_cache:
-            self.lint_cached_migration(app_label, migration_name, md5hash)
-            return
+        findings = None
+        if self.should_use_cache():
+            findings = self.get_cached_findings(app_label, migration_name)
 
-        sql_statements = self.get_sql(app_label, migration_name)
-        errors, ignored, warnings = analyse_sql_statements(
-            self.sql_analyser_class,
-            sql_statements,
-            self.exclude_migration_tests,
+        cached = findings is not None
+        if not cached:
+            if (app_label, migration_name) in self.analysed_migrations:
+                errors, warnings = self.analysed_migrations.pop(
+                    (app_label, migration_name)
+                )
+            else:
+                errors, warnings = self.analyse_migration(migration)
+            findings = {"errors": errors, "warnings": warnings}
+            if self.should_use_cache():
+                key = self.get_migration_key(app_label, migration_name)
+                self.cache[key] = findings
+
+        errors, ignored, warnings = self.apply_policy(
+            findings["errors"], findings["warnings"]
+        )
+        self.report_migration(
+            app_label, migration_name, errors, ignored, warnings, cached
         )
 
-        err, ignored_data, warnings_data = self.analyse_data_migration(migration)
+    def analyse_migration(self, migration):
+        """
+        Return the errors and warnings found in the migration, before the
+        excluded migration tests and the warnings as errors are applied,
+        which is what the cache stores.
+        """
+        sql_statements = self.get_sql(migration.app_label, migration.name)
+        errors, _, warnings = analyse_sql_statements(self.sql_analyser, sql_statements)
+
+        err, warnings_data = self.analyse_data_migration(migration)
         if err:
             errors += err
-        if ignored_data:
-            ignored += ignored_data
         if warnings_data:
             warnings += warnings_data
+        return errors, warnings
+
+    def apply_policy(self, errors, warnings):
+        """
+        Ignore the findings of the excluded migration tests and handle
+        the selected warnings as errors.
+        Return the errors, the ignored findings and the warnings.
+        """
+        ignored = [
+            issue
+            for issue in errors + warnings
+            if issue["code"] in self.exclude_migration_tests
+        ]
+        errors = [e for e in errors if e["code"] not in self.exclude_migration_tests]
+        warnings = [
+            w for w in warnings if w["code"] not in self.exclude_migration_tests
+        ]
 
         if self.all_warnings_as_errors:
             errors += warnings
@@ -192,74 +371,178 @@ class MigrationLinter(object):
                 else:
                     new_warnings.append(w)
             warnings = new_warnings
+        return errors, ignored, warnings
 
+    def report_migration(
+        self, app_label, migration_name, errors, ignored, warnings, cached=False
+    ):
+        suffix = " (cached)" if cached else ""
         # Fixme: have a more generic approach to handling errors/warnings/ignored/ok?
         if errors:
-            self.print_linting_msg(app_label, migration_name, "ERR", MessageType.ERROR)
+            self.print_linting_msg(
+                app_label, migration_name, "ERR" + suffix, MessageType.ERROR
+            )
             self.nb_erroneous += 1
             self.print_errors(errors)
             if warnings:
                 self.print_warnings(warnings)
-            value_to_cache = {"result": "ERR", "errors": errors, "warnings": warnings}
         elif warnings:
             self.print_linting_msg(
-                app_label, migration_name, "WARNING", MessageType.WARNING
+                app_label, migration_name, "WARNING" + suffix, MessageType.WARNING
             )
             self.nb_warnings += 1
             self.print_warnings(warnings)
-            value_to_cache = {"result": "WARNING", "warnings": warnings}
             # Fixme: not displaying ignored errors, when
         else:
             if ignored:
                 self.print_linting_msg(
-                    app_label, migration_name, "OK (ignored)", MessageType.IGNORE
+                    app_label,
+                    migration_name,
+                    "OK (ignored)" + suffix,
+                    MessageType.IGNORE,
                 )
                 self.print_errors(ignored)
             else:
-                self.print_linting_msg(app_label, migration_name, "OK", MessageType.OK)
+                self.print_linting_msg(
+                    app_label, migration_name, "OK" + suffix, MessageType.OK
+                )
             self.nb_valid += 1
-            value_to_cache = {"result": "OK"}
 
+    def analyse_migrations_in_parallel(self, nodes):
+        """
+        Analyse the migrations in a pool of processes, one app at a time
+        per process. The results are then reported by lint_migration,
+        in the same order as without parallelism.
+        """
+        nodes_per_app = defaultdict(list)
+        for node in nodes:
+            nodes_per_app[node[0]].append(node)
+        # Biggest apps first, to balance the work between the processes
+        tasks = sorted(nodes_per_app.values(), key=len, reverse=True)
+
+        # Forked processes must not share the database connections
+        connections.close_all()
         if self.should_use_cache():
-            self.new_cache[md5hash] = value_to_cache
+            self.cache.close()
+            self.sql_cache.close()
+            self.file_hash_cache.close()
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(self.worker_options,),
+        ) as executor:
+            for analysed_migrations, generated_sql, file_hashes in executor.map(
+                _analyse_in_worker, tasks
+            ):
+                self.analysed_migrations.update(analysed_migrations)
+                if self.should_use_cache():
+                    self.sql_cache.update(generated_sql)
+                    self.file_hash_cache.update(file_hashes)
+
+    @cached_property
+    def analysis_key(self):
+        """
+        Return the key of what the findings depend on besides the SQL: the
+        version of the linter, the SQL analyser and its migration tests.
+        The excluded migration tests are left out since they are only applied
+        when reporting.
+        """
+        hash_md5 = hashlib.md5()
+        hash_md5.update(constants.__version__.encode())
+        hash_md5.update(
+            "{}.{}".format(
+                self.sql_analyser_class.__module__,
+                self.sql_analyser_class.__qualname__,
+            ).encode()
+        )
+        for test in self.sql_analyser_class.migration_test_table:
+            hash_md5.update("\0{}".format(test["code"]).encode())
+        return hash_md5.hexdigest()
 
-    @staticmethod
-    def get_migration_hash(app_label, migration_name):
+    def get_migration_key(self, app_label, migration_name):
+        """
+        Return the key of the findings of the migration in the cache.
+        It combines the key of the SQL of the migration, which depends on the
+        migration and all its ancestors, with the analysis key: the cached SQL
+        can hence be analysed again when the findings can't be re-used.
+        """
         hash_md5 = hashlib.md5()
-        with open(get_migration_abspath(app_label, migration_name), "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
+        hash_md5.update(
+            self.sql_generator.get_sql_key((app_label, migration_name)).encode()
+        )
+        hash_md5.update(self.analysis_key.encode())
         return hash_md5.hexdigest()
 
-    def lint_cached_migration(self, app_label, migration_name, md5hash):
-        cached_value = self.old_cache[md5hash]
-        if cached_value["result"] == "IGNORE":
-            self.print_linting_msg(
-                app_label, migration_name, "IGNORE (cached)", MessageType.IGNORE
-            )
-            self.nb_ignored += 1
-        elif cached_value["result"] == "OK":
-            self.print_linting_msg(
-                app_label, migration_name, "OK (cached)", MessageType.OK
-            )
-            self.nb_valid += 1
-        elif cached_value["result"] == "WARNING":
-            self.print_linting_msg(
-                app_label, migration_name, "WARNING (cached)", MessageType.WARNING
-            )
-            self.nb_warnings += 1
-            self.print_warnings(cached_value["warnings"])
-        else:
-            self.print_linting_msg(
-                app_label, migration_name, "ERR (cached)", MessageType.ERROR
-            )
-            self.nb_erroneous += 1
-            if "errors" in cached_value:
-                self.print_errors(cached_value["errors"])
-            if "warnings" in cached_value and cached_value["warnings"]:
-                self.print_warnings(cached_value["warnings"])
+    def get_cached_findings(self, app_label, migration_name):
+        """
+        Return the cached findings of the migration, looked up in the shared
+        cache when missing from the cache, or None.
+        """
+        key = self.get_migration_key(app_label, migration_name)
+        findings = self.cache.get(key)
+        if findings is None and self.shared_cache is not None:
+            findings = self.shared_cache.get(key)
+            if findings is not None:
+                self.cache[key] = findings
+        return findings
+
+    def hash_migration_file(self, app_label, migration_name):
+        """
+        Return the hash of the migration file, which is its git blob id.
+        Files tracked by git and unmodified are not read: their blob id is
+        taken from git. With the cache, other files are only read when their
+        size, modification time or inode changed since they were last hashed.
+        """
+        node = (app_label, migration_name)
+        if node in self.migration_hashes:
+            return self.migration_hashes[node]
+
+        path = self.get_migration_path(app_label, migration_name)
+        file_hash = self.git_blob_ids.get(os.path.abspath(path))
+        if file_hash is None:
+            file_hash = self.hash_file(path)
+
+        self.migration_hashes[node] = file_hash
+        return file_hash
+
+    def hash_file(self, path):
+        if not self.should_use_cache():
+            return self.get_file_hash(path)
+
+        file_stat = self.get_file_stat(path)
+        cached_value = self.file_hash_cache.get(path)
+        if cached_value is not None and cached_value["stat"] == file_stat:
+            return cached_value["hash"]
+        file_hash = self.get_file_hash(path)
+        self.file_hash_cache[path] = {"stat": file_stat, "hash": file_hash}
+        return file_hash
+
+    @cached_property
+    def git_blob_ids(self):
+        return get_git_blob_ids(self.django_path) if self.django_path else {}
+
+    def get_migration_path(self, app_label, migration_name):
+        if app_label not in self.migration_paths:
+            self.migration_paths[app_label] = get_migration_paths(app_label)
+        path = self.migration_paths[app_label].get(migration_name)
+        if path is None:
+            path = get_migration_abspath(app_label, migration_name)
+        return path
 
-        self.new_cache[md5hash] = cached_value
+    @staticmethod
+    def get_file_stat(path):
+        stat_result = os.stat(path)
+        return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+    @staticmethod
+    def get_file_hash(path):
+        # Hash the file like git hashes blobs, so that it matches its blob id
+        with open(path, "rb") as f:
+            content = f.read()
+        hash_sha1 = hashlib.sha1()
+        hash_sha1.update("blob {}\0".format(len(content)).encode())
+        hash_sha1.update(content)
+        return hash_sha1.hexdigest()
 
     def print_linting_msg(self, app_label, migration_name, msg, lint_result):
         if lint_result.value in self.quiet:
@@ -304,28 +587,32 @@ class MigrationLinter(object):
 
     def get_sql(self, app_label, migration_name):
         logger.info(
-            "Calling sqlmigrate command {} {}".format(app_label, migration_name)
+            "Generating SQL for migration {} {}".format(app_label, migration_name)
         )
-        dev_null = open(os.devnull, "w")
         try:
-            sql_statement = call_command(
-                "sqlmigrate",
-                app_label,
-                migration_name,
-                database=self.database,
-                stdout=dev_null,
-            )
+            sql_statements = self.sql_generator.get_sql(app_label, migration_name)
         except (ValueError, ProgrammingError):
             logger.warning(
                 (
-                    "Error while executing sqlmigrate on (%s, %s). "
+                    "Error while generating the SQL of (%s, %s). "
                     "Continuing execution with empty SQL."
                 ),
                 app_label,
                 migration_name,
             )
-            sql_statement = ""
-        return sql_statement.splitlines()
+            sql_statements = []
+        return self.split_sql_statements(sql_statements)
+
+    def split_sql_statements(self, sql_statements):
+        """
+        Split the given SQL into complete statements, without comments.
+        A statement can span several lines, or share a line with others.
+        """
+        return [
+            statement
+            for sql in sql_statements
+            for statement in split_sql_statements(sql, self.sql_analyser_class.vendor)
+        ]
 
     @staticmethod
     def is_migration_file(filename):
@@ -425,42 +712,36 @@ class MigrationLinter(object):
             or (self.include_name and migration_name not in self.include_name)
             or (
                 self.only_applied_migrations
-                and (app_label, migration_name)
-                not in self.migration_loader.applied_migrations
+                and (app_label, migration_name) not in self.applied_migrations
             )
             or (
                 self.only_unapplied_migrations
-                and (app_label, migration_name)
-                in self.migration_loader.applied_migrations
+                and (app_label, migration_name) in self.applied_migrations
             )
         )
 
     def analyse_data_migration(self, migration):
         errors = []
-        ignored = []
         warnings = []
 
         for operation in migration.operations:
             if isinstance(operation, RunPython):
-                op_errors, op_ignored, op_warnings = self.lint_runpython(operation)
+                op_errors, op_warnings = self.lint_runpython(operation)
             elif isinstance(operation, RunSQL):
-                op_errors, op_ignored, op_warnings = self.lint_runsql(operation)
+                op_errors, op_warnings = self.lint_runsql(operation)
             else:
-                op_errors, op_ignored, op_warnings = [], [], []
+                op_errors, op_warnings = [], []
 
             if op_errors:
                 errors += op_errors
-            if op_ignored:
-                ignored += op_ignored
             if op_warnings:
                 warnings += op_warnings
 
-        return errors, ignored, warnings
+        return errors, warnings
 
     def lint_runpython(self, runpython):
         function_name = runpython.code.__name__
         error = []
-        ignored = []
         warning = []
 
         # Detect warning on missing reverse operation
@@ -471,10 +752,7 @@ class MigrationLinter(object):
                     function_name
                 ),
             }
-            if issue["code"] in self.exclude_migration_tests:
-                ignored.append(issue)
-            else:
-                warning.append(issue)
+            warning.append(issue)
 
         # Detect warning for argument naming convention
         args_spec = inspect.getfullargspec(runpython.code)
@@ -486,48 +764,33 @@ class MigrationLinter(object):
                     "RunPython names the two arguments: apps, schema_editor"
                 ).format(function_name),
             }
-            if issue["code"] in self.exclude_migration_tests:
-                ignored.append(issue)
-            else:
-                warning.append(issue)
+            warning.append(issue)
 
         # Detect wrong model imports
         # Forward
         issues = self.get_runpython_model_import_issues(runpython.code)
         for issue in issues:
-            if issue["code"] in self.exclude_migration_tests:
-                ignored.append(issue)
-            else:
-                error.append(issue)
+            error.append(issue)
 
         # Backward
         if runpython.reversible:
             issues = self.get_runpython_model_import_issues(runpython.reverse_code)
             for issue in issues:
-                if issue and issue["code"] in self.exclude_migration_tests:
-                    ignored.append(issue)
-                else:
-                    error.append(issue)
+                error.append(issue)
 
         # Detect warning if model variable name is not the same as model class
         issues = self.get_runpython_model_variable_naming_issues(runpython.code)
         for issue in issues:
-            if issue and issue["code"] in self.exclude_migration_tests:
-                ignored.append(issue)
-            else:
-                warning.append(issue)
+            warning.append(issue)
 
         if runpython.reversible:
             issues = self.get_runpython_model_variable_naming_issues(
                 runpython.reverse_code
             )
             for issue in issues:
-                if issue and issue["code"] in self.exclude_migration_tests:
-                    ignored.append(issue)
-                else:
-                    warning.append(issue)
+                warning.append(issue)
 
-        return error, ignored, warning
+        return error, warning
 
     @staticmethod
     def get_runpython_model_import_issues(code):
@@ -602,7 +865,6 @@ class MigrationLinter(object):
 
     def lint_runsql(self, runsql):
         error = []
-        ignored = []
         warning = []
 
         # Detect warning on missing reverse operation
@@ -611,10 +873,7 @@ class MigrationLinter(object):
                 "code": "RUNSQL_REVERSIBLE",
                 "msg": "RunSQL data migration is not reversible",
             }
-            if issue["code"] in self.exclude_migration_tests:
-                ignored.append(issue)
-            else:
-                warning.append(issue)
+            warning.append(issue)
 
         # Put the SQL in our SQL analyser
         if runsql.sql != RunSQL.noop:
@@ -633,16 +892,13 @@ class MigrationLinter(object):
                         sql_statements.append(sql)
             else:
                 sql_statements.append(runsql.sql)
+            sql_statements = self.split_sql_statements(sql_statements)
 
-            sql_errors, sql_ignored, sql_warnings = analyse_sql_statements(
-                self.sql_analyser_class,
-                sql_statements,
-                self.exclude_migration_tests,
+            sql_errors, _, sql_warnings = analyse_sql_statements(
+                self.sql_analyser, sql_statements
             )
             if sql_errors:
                 error += sql_errors
-            if sql_ignored:
-                ignored += sql_ignored
             if sql_warnings:
                 warning += sql_warnings
 
@@ -663,17 +919,47 @@ class MigrationLinter(object):
                         sql_statements.append(sql)
             else:
                 sql_statements.append(runsql.reverse_sql)
+            sql_statements = self.split_sql_statements(sql_statements)
 
-            sql_errors, sql_ignored, sql_warnings = analyse_sql_statements(
-                self.sql_analyser_class,
-                sql_statements,
-                self.exclude_migration_tests,
+            sql_errors, _, sql_warnings = analyse_sql_statements(
+                self.sql_analyser, sql_statements
             )
             if sql_errors:
                 error += sql_errors
-            if sql_ignored:
-                ignored += sql_ignored
             if sql_warnings:
                 warning += sql_warnings
 
-        return error, ignored, warning
+        return error, warning
+
+
+# Linter of the current worker process, when analysing migrations in parallel
+_worker_linter = None
+
+
+def _init_worker(linter_options):
+    global _worker_linter
+    django.setup()
+    _worker_linter = MigrationLinter(**linter_options)
+
+
+def _analyse_in_worker(nodes):
+    _worker_linter.sql_generator.generate(nodes)
+    analysed_migrations = [
+        (
+            node,
+            _worker_linter.analyse_migration(
+                _worker_linter.migration_loader.graph.nodes[node]
+            ),
+        )
+        for node in nodes
+    ]
+
+    # The cache entries of the worker are saved by the main process
+    sql_cache = _worker_linter.sql_generator.sql_cache
+    generated_sql, file_hashes = {}, {}
+    if sql_cache is not None:
+        generated_sql = dict(sql_cache.new_entries)
+        sql_cache.new_entries.clear()
+        file_hashes = dict(_worker_linter.file_hash_cache.new_entries)
+        _worker_linter.file_hash_cache.new_entries.clear()
+    return analysed_migrations, generated_sql, file_hashes
@@ -0,0 +1,104 @@
+"""
+Database connections generating the SQL of migrations without a database server.
+"""
+
+# Server versions assumed when generating SQL offline
+OFFLINE_POSTGRESQL_VERSION = 130000
+OFFLINE_MYSQL_SERVER_DATA = {
+    "version": "8.0.30",
+    "sql_mode": "",
+    "default_storage_engine": "InnoDB",
+    "sql_auto_is_null": False,
+    "lower_case_table_names": False,
+    "has_zoneinfo_database": True,
+}
+
+
+class OfflineCursor(object):
+    """Cursor of an empty database: queries are not run and return no rows."""
+
+    rowcount = 0
+    description = None
+    lastrowid = None
+
+    def execute(self, sql, params=None):
+        return self
+
+    def executemany(self, sql, param_list):
+        return self
+
+    def fetchone(self):
+        return None
+
+    def fetchmany(self, size=None):
+        return []
+
+    def fetchall(self):
+        return []
+
+    def __iter__(self):
+        return iter([])
+
+    def close(self):
+        pass
+
+
+class OfflineDatabaseWrapperMixin(object):
+    """
+    Make a database backend behave as if it were connected to an empty
+    database, without ever opening a connection.
+    Schema changes are never run in a transaction and constraint checks are no-ops.
+    """
+
+    def ensure_connection(self):
+        pass
+
+    def create_cursor(self, name=None):
+        return OfflineCursor()
+
+    def is_usable(self):
+        return True
+
+    @property
+    def queries_logged(self):
+        # Logging queries would need the database driver to quote parameters
+        return False
+
+    def schema_editor(self, *args, **kwargs):
+        # Transactions would be opened on the connection of the global handler
+        kwargs["atomic"] = False
+        return super().schema_editor(*args, **kwargs)
+
+    def disable_constraint_checking(self):
+        return True
+
+    def enable_constraint_checking(self):
+        pass
+
+    def check_constraints(self, table_names=None):
+        pass
+
+
+def get_offline_connection(connection):
+    """
+    Return a connection of the same backend and settings as the given one,
+    which generates SQL without connecting to the database.
+    """
+    wrapper_class = type(
+        "Offline{}".format(connection.__class__.__name__),
+        (OfflineDatabaseWrapperMixin, connection.__class__),
+        {},
+    )
+    offline_connection = wrapper_class(connection.settings_dict, connection.alias)
+
+    # Pre-populate the server information that backends query lazily
+    if connection.vendor == "postgresql":
+        offline_connection.pg_version = OFFLINE_POSTGRESQL_VERSION
+    elif connection.vendor == "mysql":
+        server_info = OFFLINE_MYSQL_SERVER_DATA["version"]
+        offline_connection.mysql_server_data = OFFLINE_MYSQL_SERVER_DATA
+        offline_connection.mysql_server_info = server_info
+        offline_connection.mysql_version = tuple(int(x) for x in server_info.split("."))
+        offline_connection.mysql_is_mariadb = False
+        offline_connection.sql_mode = set()
+    return offline_connection
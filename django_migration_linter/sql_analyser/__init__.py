@@ -1,6 +1,7 @@
-from .base import BaseAnalyser  # noqa
+from .base import AnalysisResult, BaseAnalyser, Finding  # noqa
 from .mysql import MySqlAnalyser  # noqa
 from .postgresql import PostgresqlAnalyser  # noqa
 from .sqlite import SqliteAnalyser  # noqa
+from .statement import Statement, split_sql_statements  # noqa
 
 from .analyser import analyse_sql_statements, get_sql_analyser_class  # noqa isort:skip
@@ -43,9 +43,12 @@ def get_sql_analyser_class_from_db_vendor(database_vendor):
     return sql_analyser_class
 
 
-def analyse_sql_statements(
-    sql_analyser_class, sql_statements, exclude_migration_tests=None
-):
-    sql_analyser = sql_analyser_class(exclude_migration_tests)
-    sql_analyser.analyse(sql_statements)
-    return sql_analyser.errors, sql_analyser.ignored, sql_analyser.warnings
+def analyse_sql_statements(sql_analyser, sql_statements, exclude_migration_tests=None):
+    """
+    Analyse the SQL statements with the given SQL analyser instance, or with
+    a new instance of the given SQL analyser class.
+    Return the errors, ignored findings and warnings.
+    """
+    if isinstance(sql_analyser, type):
+        sql_analyser = sql_analyser(exclude_migration_tests)
+    return sql_analyser.analyse(sql_statements)
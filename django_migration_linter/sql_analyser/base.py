@@ -1,53 +1,121 @@
 import logging
 import re
+from collections import namedtuple
+from types import MappingProxyType
 
+from .statement import Statement, parse_statements
 from .utils import update_migration_tests
 
 logger = logging.getLogger("django_migration_linter")
 
+# Unique indexes are only reported on quoted table names, as generated by Django
+CREATE_UNIQUE_INDEX_REGEX = re.compile('CREATE UNIQUE INDEX .* ON ".*?"')
 
-def has_not_null_column(sql_statements, **kwargs):
-    # TODO: improve to detect that the same column is concerned
-    ends_with_default = False
-    for sql in sql_statements:
-        if "SET DEFAULT" in sql:
-            ends_with_default = True
-        elif "DROP DEFAULT" in sql:
-            ends_with_default = False
-    return (
-        any(
-            re.search("(?<!DROP )NOT NULL", sql) and not sql.startswith("CREATE TABLE")
-            for sql in sql_statements
-        )
-        and ends_with_default is False
-    )
+# Findings of the analysis of the SQL statements of a migration
+AnalysisResult = namedtuple("AnalysisResult", ["errors", "ignored", "warnings"])
+# Table and column a migration test function found, see BaseAnalyser
+Finding = namedtuple("Finding", ["table", "column"])
+
+
+def has_not_null_column(sql_statements, statements, **kwargs):
+    """
+    Return the findings of the columns of existing tables that end up NOT
+    NULL without a default, following in one pass the state of each column
+    the ALTER TABLE statements add or alter.
+    """
+    created_tables = set()
+    # (table, column) -> [is NOT NULL, has a default]
+    column_states = {}
+    for statement in statements:
+        if statement.is_create_table():
+            created_tables.add(statement.table)
+            continue
+        if not statement.is_alter_table() or statement.table in created_tables:
+            continue
+
+        for action, column, flags in statement.alterations:
+            if column is None:
+                continue
+            key = (statement.table, column)
+            if action == "DROP COLUMN":
+                column_states.pop(key, None)
+                continue
+            state = column_states.setdefault(key, [False, False])
+            if action in ("ADD COLUMN", "MODIFY", "CHANGE"):
+                # The column is (re)defined
+                state[0] = "NOT NULL" in flags
+                if "DEFAULT" in flags or action == "ADD COLUMN":
+                    state[1] = "DEFAULT" in flags
+            else:
+                if "NOT NULL" in flags:
+                    state[0] = True
+                elif "DROP NOT NULL" in flags:
+                    state[0] = False
+                if "SET DEFAULT" in flags:
+                    state[1] = True
+                elif "DROP DEFAULT" in flags:
+                    state[1] = False
+    return [
+        Finding(*key)
+        for key, (is_not_null, has_default) in column_states.items()
+        if is_not_null and not has_default
+    ]
 
 
-def has_add_unique(sql_statements, **kwargs):
-    regex_result = None
-    for sql in sql_statements:
-        regex_result = re.search(
-            "ALTER TABLE (.*) ADD CONSTRAINT .* UNIQUE", sql
-        ) or re.search('CREATE UNIQUE INDEX .* ON (".*?")', sql)
-        if regex_result:
-            break
-    if not regex_result:
-        return False
-
-    concerned_table = regex_result.group(1)
-    table_is_added_in_transaction = any(
-        sql.startswith("CREATE TABLE {}".format(concerned_table))
-        for sql in sql_statements
+def has_add_unique(sql_statements, statements, **kwargs):
+    """
+    Return whether a unique constraint or index is added to a table that
+    isn't created in the same migration.
+    """
+    created_tables = {
+        statement.table for statement in statements if statement.is_create_table()
+    }
+    return any(
+        (
+            statement.constraint == "UNIQUE"
+            or (
+                statement.verb == "CREATE"
+                and statement.object_type == "INDEX"
+                and "UNIQUE" in statement.flags
+                and CREATE_UNIQUE_INDEX_REGEX.search(statement.sql)
+            )
+        )
+        and statement.table not in created_tables
+        for statement in statements
     )
-    return not table_is_added_in_transaction
 
 
 class BaseAnalyser(object):
+    """
+    Analyse the SQL statements of a migration with the migration tests.
+
+    A migration test either checks each statement ("one_liner" mode) or all
+    statements of the migration at once ("transaction" mode). One-liner tests
+    match statements with a regular expression, the "pattern", and/or a
+    function, the "fn"; transaction tests only have a function.
+    One-liner tests can also declare "keywords", one of which a statement must
+    contain for the test to apply to it.
+
+    The migration tests of an analyser class are its 'migration_tests' merged
+    onto the 'base_migration_tests'. They are merged once, when the class is
+    created, into a read-only table with compiled patterns.
+    The one-liner tests that apply to a statement are looked up in a dispatch
+    table, by the keywords the statement contains, and only their patterns
+    are searched.
+
+    Each statement is parsed once, with the tokenizer of the analyser's
+    'vendor', into a Statement record. Functions of one-liner tests receive
+    it as 'statement', and those of transaction tests receive the records of
+    all statements as 'statements'. A function can return a Finding, or a
+    list of them, to report the table and column it found; any other true
+    value reports one finding, whose table and column are detected in the SQL.
+    """
+
     base_migration_tests = [
         {
             "code": "RENAME_TABLE",
-            "fn": lambda sql, **kw: re.search("RENAME TABLE", sql)
-            or re.search("ALTER TABLE .* RENAME TO", sql),
+            "pattern": "RENAME TABLE|ALTER TABLE .* RENAME TO",
+            "keywords": ("RENAME TABLE", "RENAME TO"),
             "msg": "RENAMING tables",
             "mode": "one_liner",
             "type": "error",
@@ -61,31 +129,32 @@ class BaseAnalyser(object):
         },
         {
             "code": "DROP_COLUMN",
-            "fn": lambda sql, **kw: re.search("DROP COLUMN", sql),
+            "pattern": "DROP COLUMN",
+            "keywords": ("DROP COLUMN",),
             "msg": "DROPPING columns",
             "mode": "one_liner",
             "type": "error",
         },
         {
             "code": "DROP_TABLE",
-            "fn": lambda sql, **kw: sql.startswith("DROP TABLE"),
+            "pattern": "^DROP TABLE",
+            "keywords": ("DROP TABLE",),
             "msg": "DROPPING table",
             "mode": "one_liner",
             "type": "error",
         },
         {
             "code": "RENAME_COLUMN",
-            "fn": lambda sql, **kw: re.search("ALTER TABLE .* CHANGE", sql)
-            or re.search("ALTER TABLE .* RENAME COLUMN", sql),
+            "pattern": "ALTER TABLE .* CHANGE|ALTER TABLE .* RENAME COLUMN",
+            "keywords": ("CHANGE", "RENAME COLUMN"),
             "msg": "RENAMING columns",
             "mode": "one_liner",
             "type": "error",
         },
         {
             "code": "ALTER_COLUMN",
-            "fn": lambda sql, **kw: re.search(
-                "ALTER TABLE .* ALTER COLUMN .* TYPE", sql
-            ),
+            "pattern": "ALTER TABLE .* ALTER COLUMN .* TYPE",
+            "keywords": ("ALTER COLUMN",),
             "msg": (
                 "ALTERING columns (Could be backward compatible. "
                 "You may ignore this migration.)"
@@ -104,47 +173,152 @@ class BaseAnalyser(object):
 
     migration_tests = []
 
-    def __init__(self, exclude_migration_tests):
+    # Database vendor whose SQL syntax the statements are parsed with
+    vendor = None
+
+    # Merged migration tests of the class, see build_migration_test_table()
+    migration_test_table = ()
+    one_line_migration_tests = ()
+    transaction_migration_tests = ()
+    # Keywords of the one-liner tests
+    keywords = ()
+    # Keywords found in a statement -> one-liner tests that apply to it
+    dispatch_table = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.build_migration_test_table()
+
+    @classmethod
+    def build_migration_test_table(cls):
+        migration_test_table = []
+        for test in update_migration_tests(
+            cls.base_migration_tests, cls.migration_tests
+        ):
+            if test.get("pattern") is not None:
+                test["pattern"] = re.compile(test["pattern"])
+            else:
+                test["pattern"] = None
+            test.setdefault("fn", None)
+            test["keywords"] = tuple(test.get("keywords") or ())
+            if test["fn"] is None and (
+                test["pattern"] is None or test["mode"] != "one_liner"
+            ):
+                raise ValueError(
+                    "Migration test {} has nothing to test SQL with.".format(
+                        test["code"]
+                    )
+                )
+            migration_test_table.append(MappingProxyType(test))
+
+        cls.migration_test_table = tuple(migration_test_table)
+        cls.one_line_migration_tests = tuple(
+            test for test in cls.migration_test_table if test["mode"] == "one_liner"
+        )
+        cls.transaction_migration_tests = tuple(
+            test for test in cls.migration_test_table if test["mode"] == "transaction"
+        )
+        cls.keywords = tuple(
+            sorted(
+                {
+                    keyword
+                    for test in cls.one_line_migration_tests
+                    for keyword in test["keywords"]
+                }
+            )
+        )
+        cls.dispatch_table = {}
+
+    @classmethod
+    def get_dispatch(cls, keywords):
+        """
+        Return the one-liner tests that apply to statements containing the
+        given keywords. Tests without keywords apply to all statements.
+        """
+        tests = cls.dispatch_table.get(keywords)
+        if tests is None:
+            tests = cls.dispatch_table[keywords] = tuple(
+                test
+                for test in cls.one_line_migration_tests
+                if not test["keywords"]
+                or any(keyword in keywords for keyword in test["keywords"])
+            )
+        return tests
+
+    def __init__(self, exclude_migration_tests=None):
         self.exclude_migration_tests = exclude_migration_tests or []
+        self.reset()
+
+    def reset(self):
+        """Forget the findings of the previous analysis."""
         self.errors = []
         self.warnings = []
         self.ignored = []
-        self.migration_tests = update_migration_tests(
-            self.base_migration_tests, self.migration_tests
-        )
+        # Parsed statement being tested, read by detect_table and detect_column
+        self.statement = None
 
     def analyse(self, sql_statements):
-        for statement in sql_statements:
-            for test in self.one_line_migration_tests:
-                self._test_sql(test, sql=statement)
+        """
+        Analyse the SQL statements of a migration and return the findings.
+        The analyser is reset first, so the same instance can analyse the
+        statements of many migrations.
+        """
+        self.reset()
+        statements = parse_statements(sql_statements, self.vendor)
+        for statement in statements:
+            for test in self.scan(statement.sql):
+                self._test_sql(test, sql=statement.sql, statement=statement)
 
         for test in self.transaction_migration_tests:
-            self._test_sql(test, sql=sql_statements)
-
-    @property
-    def one_line_migration_tests(self):
-        return (test for test in self.migration_tests if test["mode"] == "one_liner")
-
-    @property
-    def transaction_migration_tests(self):
-        return (test for test in self.migration_tests if test["mode"] == "transaction")
-
-    def _test_sql(self, test, sql):
-        if test["fn"](sql, errors=self.errors):
-            if test["code"] in self.exclude_migration_tests:
-                action = "IGNORED"
-                list_to_add = self.ignored
-            elif test["type"] == "warning":
-                action = "WARNING"
-                list_to_add = self.warnings
-            else:
-                action = "ERROR"
-                list_to_add = self.errors
-            logger.debug("Testing %s -- %s", sql, action)
-            err = self.build_error_dict(migration_test=test, sql_statement=sql)
-            list_to_add.append(err)
-        else:
+            self._test_sql(test, sql=sql_statements, statements=statements)
+
+        return AnalysisResult(self.errors, self.ignored, self.warnings)
+
+    def scan(self, sql):
+        """
+        Return the one-liner tests that apply to the SQL statement and whose
+        pattern matches it, along with those without pattern.
+        """
+        tests = self.get_dispatch(
+            tuple(keyword for keyword in self.keywords if keyword in sql)
+        )
+        return [
+            test
+            for test in tests
+            if test["pattern"] is None or test["pattern"].search(sql)
+        ]
+
+    def _test_sql(self, test, sql, **kwargs):
+        result = test["fn"] is None or test["fn"](sql, errors=self.errors, **kwargs)
+        if not result:
             logger.debug("Testing %s -- PASSED", sql)
+            return
+
+        if test["code"] in self.exclude_migration_tests:
+            action = "IGNORED"
+            list_to_add = self.ignored
+        elif test["type"] == "warning":
+            action = "WARNING"
+            list_to_add = self.warnings
+        else:
+            action = "ERROR"
+            list_to_add = self.errors
+        logger.debug("Testing %s -- %s", sql, action)
+
+        self.statement = kwargs.get("statement")
+        if isinstance(result, Finding):
+            result = [result]
+        if isinstance(result, list) and all(
+            isinstance(finding, Finding) for finding in result
+        ):
+            for finding in result:
+                error = self.build_error_dict(migration_test=test, sql_statement=sql)
+                error["table"], error["column"] = finding
+                list_to_add.append(error)
+        else:
+            list_to_add.append(
+                self.build_error_dict(migration_test=test, sql_statement=sql)
+            )
 
     def build_error_dict(self, migration_test, sql_statement):
         table = self.detect_table(sql_statement)
@@ -156,16 +330,21 @@ class BaseAnalyser(object):
             "column": col,
         }
 
-    @staticmethod
-    def detect_table(sql):
-        if isinstance(sql, str):
-            regex_result = re.search("TABLE [`\"'](.*?)[`\"']", sql, re.IGNORECASE)
-            if regex_result:
-                return regex_result.group(1)
-
-    @staticmethod
-    def detect_column(sql):
-        if isinstance(sql, str):
-            regex_result = re.search("COLUMN [`\"'](.*?)[`\"']", sql, re.IGNORECASE)
-            if regex_result:
-                return regex_result.group(1)
+    def get_statement(self, sql):
+        """Return the parsed statement of the SQL, None for transactions."""
+        if not isinstance(sql, str):
+            return None
+        if self.statement is None or self.statement.sql != sql:
+            self.statement = Statement(sql, self.vendor)
+        return self.statement
+
+    def detect_table(self, sql):
+        statement = self.get_statement(sql)
+        return statement.table if statement is not None else None
+
+    def detect_column(self, sql):
+        statement = self.get_statement(sql)
+        return statement.column if statement is not None else None
+
+
+BaseAnalyser.build_migration_test_table()
@@ -1,65 +1,58 @@
-import re
-
 from .base import BaseAnalyser
+from .statement import WORD
 
 
-def has_create_index(sql_statements, **kwargs):
-    regex_result = None
-    for sql in sql_statements:
-        regex_result = re.search(r"CREATE (UNIQUE )?INDEX.*ON (.*) \(", sql)
-        if re.search("INDEX CONCURRENTLY", sql):
-            regex_result = None
-        elif regex_result:
-            break
-    if not regex_result:
-        return False
+def has_create_index(sql_statements, statements, **kwargs):
+    for statement in statements:
+        if (
+            statement.verb == "CREATE"
+            and statement.object_type == "INDEX"
+            and "CONCURRENTLY" not in statement.flags
+        ):
+            return not any(
+                other.is_create_table(statement.table) for other in statements
+            )
+    return False
 
-    concerned_table = regex_result.group(2)
-    table_is_added_in_transaction = any(
-        sql.startswith("CREATE TABLE {}".format(concerned_table))
-        for sql in sql_statements
-    )
-    return not table_is_added_in_transaction
 
+def has_unique_constraint(statement):
+    words = [
+        token.value.upper() if token.kind == WORD else None
+        for token in statement.tokens
+    ]
+    return ("UNIQUE", "CONSTRAINT") in zip(words, words[1:])
 
-def has_add_unique_column(sql_statements, **kwargs):
-    regex_result = None
-    for sql in sql_statements:
-        regex_result = re.search(
-            "ALTER TABLE (.*) ADD COLUMN .*UNIQUE CONSTRAINT.*",
-            sql
-        )
-        if regex_result:
-            break
-    if not regex_result:
-        return False
 
-    concerned_table = regex_result.group(1)
-    table_is_added_in_transaction = any(
-        sql.startswith("CREATE TABLE {}".format(concerned_table))
-        for sql in sql_statements
-    )
-    return not table_is_added_in_transaction
+def has_add_unique_column(sql_statements, statements, **kwargs):
+    for statement in statements:
+        if (
+            statement.is_alter_table()
+            and any(action == "ADD COLUMN" for action, _, _ in statement.alterations)
+            and has_unique_constraint(statement)
+        ):
+            return not any(
+                other.is_create_table(statement.table) for other in statements
+            )
+    return False
 
 
-def multiple_table_locks(sql_statements, **kwargs):
+def multiple_table_locks(sql_statements, statements, **kwargs):
     """Returns true if there are more than 2 table locks
 
     go/created-at-migration-postportem
     """
     tables = set()
 
-    for sql in sql_statements:
-        result = re.search('ALTER TABLE "([\w]+)".*', sql)
-
-        if result:
-            table_name = result.group(1)
-            tables.add(table_name)
+    for statement in statements:
+        if statement.is_alter_table():
+            tables.add(statement.table)
 
     return len(tables) > 2
 
 
 class PostgresqlAnalyser(BaseAnalyser):
+    vendor = "postgresql"
+
     migration_tests = [
         {
             "code": "CREATE_INDEX",
@@ -70,15 +63,17 @@ class PostgresqlAnalyser(BaseAnalyser):
         },
         {
             "code": "DROP_INDEX",
-            "fn": lambda sql, **kw: re.search("DROP INDEX", sql)
-            and not re.search("INDEX CONCURRENTLY", sql),
+            "pattern": "DROP INDEX",
+            "keywords": ("DROP INDEX",),
+            "fn": lambda sql, statement, **kw: "CONCURRENTLY" not in statement.flags,
             "msg": "DROP INDEX locks table",
             "mode": "one_liner",
             "type": "warning",
         },
         {
             "code": "REINDEX",
-            "fn": lambda sql, **kw: sql.startswith("REINDEX"),
+            "pattern": "^REINDEX",
+            "keywords": ("REINDEX",),
             "msg": "REINDEX locks table",
             "mode": "one_liner",
             "type": "warning",
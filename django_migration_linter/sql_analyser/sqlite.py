@@ -2,49 +2,55 @@ import re
 
 from .base import BaseAnalyser
 
+RENAME_TABLE_REGEX = re.compile("ALTER TABLE .* RENAME TO")
+
+
+def is_table_rebuild(statement):
+    """
+    Return whether the statement renames a table to or from the copy SQLite
+    uses to rebuild it.
+    """
+    return statement.action == "RENAME TO" and (
+        (statement.table or "").startswith("new__")
+        or (statement.new_name or "").endswith("__old")
+    )
+
+
+def has_not_null_column(sql_statements, statements, **kwargs):
+    return any(is_table_rebuild(statement) for statement in statements) and any(
+        "NOT NULL" in flags and "PRIMARY KEY" not in flags and "DEFAULT" not in flags
+        for statement in statements
+        for flags in statement.column_flags.values()
+    )
+
 
 class SqliteAnalyser(BaseAnalyser):
+    vendor = "sqlite"
+
     migration_tests = [
         {
             "code": "RENAME_TABLE",
-            "fn": lambda sql, **kw: re.search("ALTER TABLE .* RENAME TO", sql)
-            and "__old" not in sql
-            and "new__" not in sql,
+            "pattern": RENAME_TABLE_REGEX.pattern,
+            "keywords": ("RENAME TO",),
+            "fn": lambda sql, statement, **kw: not is_table_rebuild(statement),
             "type": "error",
         },
         {
             "code": "DROP_TABLE",
             # TODO: improve to detect that the table names overlap
-            "fn": lambda sql_statements, **kw: any(
-                sql.startswith("DROP TABLE") for sql in sql_statements
+            "fn": lambda sql_statements, statements, **kw: any(
+                statement.verb == "DROP" and statement.object_type == "TABLE"
+                for statement in statements
             )
-            and not any(sql.startswith("CREATE TABLE") for sql in sql_statements),
+            and not any(statement.is_create_table() for statement in statements),
             "msg": "DROPPING table",
             "mode": "transaction",
             "type": "error",
         },
         {
             "code": "NOT_NULL",
-            "fn": lambda sql_statements, **kw: any(
-                re.search("NOT NULL(?! PRIMARY)(?! DEFAULT)", sql)
-                for sql in sql_statements
-            )
-            and any(
-                re.search("ALTER TABLE .* RENAME TO", sql)
-                and ("__old" in sql or "new__" in sql)
-                for sql in sql_statements
-            ),
+            "fn": has_not_null_column,
             "mode": "transaction",
             "type": "error",
         },
     ]
-
-    @staticmethod
-    def detect_table(sql):
-        if isinstance(sql, str):
-            regex_result = re.search("TABLE [`\"'](.*?)[`\"']", sql, re.IGNORECASE)
-            if regex_result:
-                return regex_result.group(1)
-            regex_result = re.search("ON [`\"'](.*?)[`\"']", sql, re.IGNORECASE)
-            if regex_result:
-                return regex_result.group(1)
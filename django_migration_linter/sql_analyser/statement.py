@@ -0,0 +1,531 @@
+"""
+Parsing of SQL statements into the records the migration tests look at.
+
+Each statement is tokenized once, and what it does (verb, object type, table,
+columns, constraint, flags) is read from its tokens, instead of every migration
+test searching the SQL with its own regular expressions.
+"""
+import re
+from collections import namedtuple
+
+WORD = "word"
+NAME = "name"
+STRING = "string"
+NUMBER = "number"
+SYMBOL = "symbol"
+
+Token = namedtuple("Token", ["kind", "value"])
+
+STANDARD_STRING_PATTERN = r"'(?:[^']|'')*'"
+# MySQL escapes quotes in strings with backslashes
+BACKSLASH_STRING_PATTERN = r"'(?:[^'\\]|\\.|'')*'"
+# PostgreSQL only does it in escape string constants
+ESCAPE_STRING_PATTERN = r"[Ee]'(?:[^'\\]|\\.|'')*'"
+# PostgreSQL function bodies are usually dollar-quoted
+DOLLAR_QUOTED_STRING_PATTERN = r"\$(?P<dollar_tag>\w*)\$.*?\$(?P=dollar_tag)\$"
+# Names quoted the way of other vendors are accepted too, since the SQL of a
+# database can be analysed with the SQL analyser of another vendor
+DOUBLE_QUOTED_NAME_PATTERN = r'"(?:[^"]|"")*"'
+BACKQUOTED_NAME_PATTERN = r"`(?:[^`]|``)*`"
+BRACKETED_NAME_PATTERN = r"\[[^\]]*\]"
+
+
+def build_token_regex(string_patterns, name_patterns):
+    return re.compile(
+        r"""
+        (?P<space>\s+)
+        |(?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+        |(?P<string>{})
+        |(?P<name>{})
+        |(?P<word>[^\W\d]\w*)
+        |(?P<number>\d+(?:\.\d*)?)
+        |(?P<symbol>.)
+        """.format(
+            "|".join(string_patterns), "|".join(name_patterns)
+        ),
+        re.VERBOSE | re.DOTALL,
+    )
+
+
+TOKEN_REGEXES = {
+    None: build_token_regex(
+        [STANDARD_STRING_PATTERN],
+        [DOUBLE_QUOTED_NAME_PATTERN, BACKQUOTED_NAME_PATTERN],
+    ),
+    "mysql": build_token_regex(
+        [BACKSLASH_STRING_PATTERN],
+        [BACKQUOTED_NAME_PATTERN, DOUBLE_QUOTED_NAME_PATTERN],
+    ),
+    "postgresql": build_token_regex(
+        [
+            ESCAPE_STRING_PATTERN,
+            STANDARD_STRING_PATTERN,
+            DOLLAR_QUOTED_STRING_PATTERN,
+        ],
+        [DOUBLE_QUOTED_NAME_PATTERN, BACKQUOTED_NAME_PATTERN],
+    ),
+    "sqlite": build_token_regex(
+        [STANDARD_STRING_PATTERN],
+        [DOUBLE_QUOTED_NAME_PATTERN, BACKQUOTED_NAME_PATTERN, BRACKETED_NAME_PATTERN],
+    ),
+}
+
+
+def find_flags(tokens):
+    """Return the noteworthy keywords of the tokens, see Statement.flags."""
+    flags = set()
+    words = [token.value.upper() if token.kind == WORD else None for token in tokens]
+    for i, word in enumerate(words):
+        previous = words[i - 1] if i >= 1 else None
+        if word == "CONCURRENTLY" or word == "UNIQUE":
+            flags.add(word)
+        elif word == "KEY" and previous == "PRIMARY":
+            flags.add("PRIMARY KEY")
+        elif word == "NULL" and previous == "NOT":
+            before = words[i - 2] if i >= 2 else None
+            if before == "DROP":
+                flags.add("DROP NOT NULL")
+            elif before != "IS":
+                flags.add("NOT NULL")
+        elif word == "DEFAULT":
+            if previous == "SET" or previous == "DROP":
+                flags.add("{} DEFAULT".format(previous))
+            else:
+                flags.add("DEFAULT")
+    return frozenset(flags)
+
+
+def unquote_name(name):
+    quote = name[0]
+    if quote == "[":
+        return name[1:-1]
+    return name[1:-1].replace(quote * 2, quote)
+
+
+def iter_tokens(sql, vendor=None):
+    """
+    Split the SQL into tokens, leaving out spaces and comments.
+    Quoted names are unquoted, and unterminated quotes are kept as symbols.
+    """
+    for match in TOKEN_REGEXES.get(vendor, TOKEN_REGEXES[None]).finditer(sql):
+        kind = match.lastgroup
+        if kind == NAME:
+            yield Token(NAME, unquote_name(match.group()))
+        elif kind != "space" and kind != "comment":
+            yield Token(kind, match.group())
+
+
+def tokenize(sql, vendor=None):
+    return list(iter_tokens(sql, vendor))
+
+
+def split_sql_statements(sql, vendor=None):
+    """
+    Yield the statements of the SQL text one by one, on a single line: the
+    comments and spaces around them are left out, those within them are
+    collapsed into single spaces. The semicolons in strings, quoted names
+    and comments don't end statements.
+    """
+    pieces = []
+    start = end = None
+    for match in TOKEN_REGEXES.get(vendor, TOKEN_REGEXES[None]).finditer(sql):
+        kind = match.lastgroup
+        if kind == "space" or kind == "comment":
+            if start is not None and (kind == "comment" or match.group() != " "):
+                pieces.append(sql[start:end])
+                start = None
+            continue
+        if start is None:
+            start = match.start()
+        end = match.end()
+        if kind == SYMBOL and match.group() == ";":
+            pieces.append(sql[start:end])
+            if len(pieces) > 1 or end - start > 1:
+                yield " ".join(pieces)
+            pieces = []
+            start = None
+    if start is not None:
+        pieces.append(sql[start:end])
+    if pieces:
+        yield " ".join(pieces)
+
+
+# Words that can come between CREATE and the type of the created object
+CREATE_MODIFIERS = {"OR", "REPLACE", "TEMP", "TEMPORARY", "UNLOGGED", "UNIQUE"}
+# Words starting the constraints of CREATE TABLE statements
+TABLE_CONSTRAINT_WORDS = {
+    "CONSTRAINT",
+    "PRIMARY",
+    "UNIQUE",
+    "FOREIGN",
+    "CHECK",
+    "EXCLUDE",
+    "KEY",
+    "INDEX",
+}
+# Kinds of constraints added by ALTER TABLE statements
+CONSTRAINT_KINDS = {
+    "UNIQUE": "UNIQUE",
+    "PRIMARY": "PRIMARY KEY",
+    "FOREIGN": "FOREIGN KEY",
+    "CHECK": "CHECK",
+    "EXCLUDE": "EXCLUDE",
+}
+
+
+class Statement(object):
+    """
+    A SQL statement parsed into:
+    - verb: its first word, e.g. CREATE, ALTER or DROP
+    - object_type: the type of object it acts on, e.g. TABLE or INDEX
+    - table: the name of the table concerned
+    - action: what an ALTER TABLE statement does, e.g. ADD COLUMN, ADD
+      CONSTRAINT, ALTER COLUMN, DROP COLUMN, RENAME COLUMN or RENAME TO
+    - column: the column an ALTER TABLE statement acts on
+    - columns: the columns of a created table or index
+    - constraint: the kind of constraint added, e.g. UNIQUE or FOREIGN KEY
+    - new_name: the new name of a renamed table
+    - flags: noteworthy keywords, i.e. CONCURRENTLY, UNIQUE, PRIMARY KEY,
+      NOT NULL, DROP NOT NULL, DEFAULT, SET DEFAULT and DROP DEFAULT
+    - column_flags: the flags of each column the statement defines or alters
+    - alterations: the (action, column, flags) of each action of an ALTER
+      TABLE statement, e.g. ("ADD COLUMN", "a", {"NOT NULL"})
+    The action, column, constraint and new name of an ALTER TABLE statement
+    are those of its first action.
+    Statements that can't be parsed only have the fields found so far.
+
+    Only the tokens telling what the statement does are read when it is
+    parsed. The rest of the statement, e.g. the column definitions of a
+    created table or the other actions of an altered table, is tokenized when
+    the flags or columns are first looked at.
+    """
+
+    __slots__ = (
+        "sql",
+        "verb",
+        "object_type",
+        "table",
+        "action",
+        "column",
+        "constraint",
+        "new_name",
+        "position",
+        "_tokens",
+        "_token_iterator",
+        "_flags",
+        "_columns",
+        "_column_flags",
+        "_alterations",
+    )
+
+    def __init__(self, sql, vendor=None):
+        self.sql = sql
+        self.verb = None
+        self.object_type = None
+        self.table = None
+        self.action = None
+        self.column = None
+        self.constraint = None
+        self.new_name = None
+        self.position = 0
+        self._tokens = []
+        self._token_iterator = iter_tokens(sql, vendor)
+        self._flags = None
+        self._columns = ()
+        self._column_flags = {}
+        self._alterations = ()
+
+        self.verb = self.next_word()
+        parse = getattr(self, "parse_{}".format((self.verb or "").lower()), None)
+        if parse is not None:
+            parse()
+
+    def __repr__(self):
+        return "<Statement {}>".format(self.sql)
+
+    @property
+    def tokens(self):
+        self._tokens.extend(self._token_iterator)
+        return self._tokens
+
+    @property
+    def flags(self):
+        if self._flags is None:
+            self._flags = find_flags(self.tokens)
+        return self._flags
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self.parse_columns()
+        return self._columns
+
+    @property
+    def column_flags(self):
+        if self._column_flags is None:
+            self.parse_columns()
+        return self._column_flags
+
+    @property
+    def alterations(self):
+        if self._alterations is None:
+            self.parse_columns()
+        return self._alterations
+
+    def is_create_table(self, table=None):
+        return (
+            self.verb == "CREATE"
+            and self.object_type == "TABLE"
+            and (table is None or self.table == table)
+        )
+
+    def is_alter_table(self, table=None):
+        return (
+            self.verb == "ALTER"
+            and self.object_type == "TABLE"
+            and (table is None or self.table == table)
+        )
+
+    def peek(self, offset=0):
+        position = self.position + offset
+        while position >= len(self._tokens):
+            token = next(self._token_iterator, None)
+            if token is None:
+                return None
+            self._tokens.append(token)
+        return self._tokens[position]
+
+    def peek_word(self, offset=0):
+        token = self.peek(offset)
+        if token is not None and token.kind == WORD:
+            return token.value.upper()
+        return None
+
+    def next_word(self):
+        word = self.peek_word()
+        if word is not None:
+            self.position += 1
+        return word
+
+    def skip_words(self, *words):
+        """Skip the given sequence of words if the statement continues with it."""
+        if all(self.peek_word(i) == word for i, word in enumerate(words)):
+            self.position += len(words)
+            return True
+        return False
+
+    def next_name(self):
+        """Return the next name, qualified with its schema if any."""
+        token = self.peek()
+        if token is None or token.kind not in (NAME, WORD):
+            return None
+        self.position += 1
+        name = token.value
+        while self.peek() == Token(SYMBOL, ".") and self.peek(1) is not None:
+            name = "{}.{}".format(name, self.peek(1).value)
+            self.position += 2
+        return name
+
+    def next_parenthesized_items(self):
+        """
+        Return the tokens of each item of the parenthesized list that follows,
+        e.g. the column definitions of a created table.
+        """
+        while self.peek() is not None and self.peek() != Token(SYMBOL, "("):
+            self.position += 1
+        items = []
+        depth = 0
+        tokens = self.tokens
+        for position in range(self.position, len(tokens)):
+            token = tokens[position]
+            self.position = position + 1
+            if token == Token(SYMBOL, "("):
+                depth += 1
+                if depth == 1:
+                    items.append([])
+                    continue
+            elif token == Token(SYMBOL, ")"):
+                depth -= 1
+                if depth == 0:
+                    break
+            elif token == Token(SYMBOL, ",") and depth == 1:
+                items.append([])
+                continue
+            items[-1].append(token)
+        return [item for item in items if item]
+
+    def parse_create(self):
+        while self.peek_word() in CREATE_MODIFIERS:
+            self.position += 1
+        self.object_type = self.next_word()
+        if self.object_type == "TABLE":
+            self.skip_words("IF", "NOT", "EXISTS")
+            self.table = self.next_name()
+            # The column definitions are parsed when first looked at
+            self._columns = self._column_flags = None
+        elif self.object_type == "INDEX":
+            self.skip_words("CONCURRENTLY")
+            self.skip_words("IF", "NOT", "EXISTS")
+            if self.peek_word() != "ON":
+                self.next_name()
+            if self.skip_words("ON"):
+                self.skip_words("ONLY")
+                self.table = self.next_name()
+                # Expressions are not columns
+                self._columns = tuple(
+                    item[0].value
+                    for item in self.next_parenthesized_items()
+                    if item[0].kind in (NAME, WORD)
+                    and (len(item) == 1 or item[1] != Token(SYMBOL, "("))
+                )
+
+    def parse_columns(self):
+        if self.verb == "ALTER":
+            self.parse_alter_actions()
+        else:
+            self.parse_column_definitions()
+
+    def parse_column_definitions(self):
+        column_flags = {}
+        for item in self.next_parenthesized_items():
+            if item[0].kind == NAME or (
+                item[0].kind == WORD
+                and item[0].value.upper() not in TABLE_CONSTRAINT_WORDS
+            ):
+                column_flags[item[0].value] = find_flags(item[1:])
+        self._columns = tuple(column_flags)
+        self._column_flags = column_flags
+
+    def parse_alter(self):
+        self.object_type = self.next_word()
+        if self.object_type != "TABLE":
+            return
+        self.skip_words("IF", "EXISTS")
+        self.skip_words("ONLY")
+        self.table = self.next_name()
+
+        (
+            self.action,
+            self.column,
+            self.constraint,
+            self.new_name,
+        ) = self.parse_alter_action()
+        # The other actions are parsed when first looked at
+        self._columns = self._column_flags = self._alterations = None
+
+    def parse_alter_action(self):
+        """
+        Return the action, column, kind of constraint and new name of the
+        ALTER TABLE action that follows.
+        """
+        column = constraint = new_name = None
+        word = self.next_word()
+        if word == "ADD":
+            if self.skip_words("CONSTRAINT"):
+                self.next_name()
+            if self.peek_word() in CONSTRAINT_KINDS:
+                action = "ADD CONSTRAINT"
+                constraint = CONSTRAINT_KINDS[self.next_word()]
+            elif self.peek_word() in ("INDEX", "KEY"):
+                action = "ADD INDEX"
+            else:
+                action = "ADD COLUMN"
+                self.skip_words("COLUMN")
+                self.skip_words("IF", "NOT", "EXISTS")
+                column = self.next_name()
+        elif word == "ALTER":
+            action = "ALTER COLUMN"
+            self.skip_words("COLUMN")
+            column = self.next_name()
+        elif word == "DROP":
+            if self.peek_word() in ("CONSTRAINT", "INDEX", "KEY", "PRIMARY", "FOREIGN"):
+                action = "DROP {}".format(self.next_word())
+            else:
+                action = "DROP COLUMN"
+                self.skip_words("COLUMN")
+                self.skip_words("IF", "EXISTS")
+                column = self.next_name()
+        elif word == "RENAME":
+            if self.skip_words("TO") or self.skip_words("AS"):
+                action = "RENAME TO"
+                new_name = self.next_name()
+            elif self.peek_word() in ("CONSTRAINT", "INDEX", "KEY"):
+                action = "RENAME {}".format(self.next_word())
+            else:
+                action = "RENAME COLUMN"
+                self.skip_words("COLUMN")
+                column = self.next_name()
+        elif word in ("MODIFY", "CHANGE"):
+            action = word
+            self.skip_words("COLUMN")
+            column = self.next_name()
+        else:
+            action = word
+        return action, column, constraint, new_name
+
+    def parse_alter_actions(self):
+        """Split the ALTER TABLE statement into its comma-separated actions."""
+        tokens = self.tokens
+        # The first action starts after the table name, the others after the
+        # commas outside parentheses
+        starts = []
+        depth = 0
+        for position, token in enumerate(tokens):
+            if token == Token(SYMBOL, "("):
+                depth += 1
+            elif token == Token(SYMBOL, ")"):
+                depth -= 1
+            elif token == Token(SYMBOL, ",") and depth == 0:
+                starts.append(position + 1)
+        ends = [start - 1 for start in starts] + [len(tokens)]
+
+        alterations = [(self.action, self.column, find_flags(tokens[: ends[0]]))]
+        for start, end in zip(starts, ends[1:]):
+            self.position = start
+            action, column, _, _ = self.parse_alter_action()
+            alterations.append((action, column, find_flags(tokens[start:end])))
+
+        column_flags = {}
+        for _, column, flags in alterations:
+            if column is not None:
+                column_flags[column] = column_flags.get(column, frozenset()) | flags
+        self._columns = tuple(column_flags)
+        self._column_flags = column_flags
+        self._alterations = tuple(alterations)
+
+    def parse_drop(self):
+        self.object_type = self.next_word()
+        self.skip_words("CONCURRENTLY")
+        self.skip_words("IF", "EXISTS")
+        if self.object_type == "TABLE":
+            self.table = self.next_name()
+        elif self.object_type == "INDEX":
+            if self.peek_word() != "ON":
+                self.next_name()
+            if self.skip_words("ON"):
+                self.table = self.next_name()
+
+    def parse_rename(self):
+        self.object_type = self.next_word()
+        if self.object_type == "TABLE":
+            self.table = self.next_name()
+            self.action = "RENAME TO"
+            if self.skip_words("TO"):
+                self.new_name = self.next_name()
+
+    def parse_reindex(self):
+        self.object_type = self.next_word()
+        if self.object_type == "TABLE":
+            self.skip_words("CONCURRENTLY")
+            self.table = self.next_name()
+
+    def parse_insert(self):
+        if self.skip_words("INTO"):
+            self.table = self.next_name()
+
+    def parse_update(self):
+        self.table = self.next_name()
+
+
+def parse_statements(sql_statements, vendor=None):
+    return [Statement(sql, vendor) for sql in sql_statements]
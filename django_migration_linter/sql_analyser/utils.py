@@ -16,6 +16,12 @@ def update_migration_tests(base_tests, specific_tests):
             migration_test_dict = {}
             base_tests.append(migration_test_dict)
 
+        if "fn" in override_test or "pattern" in override_test:
+            # The overriding test replaces how SQL is tested altogether
+            migration_test_dict.pop("fn", None)
+            migration_test_dict.pop("pattern", None)
+            migration_test_dict.pop("keywords", None)
+
         for key in override_test.keys():
             migration_test_dict[key] = override_test[key]
     return base_tests
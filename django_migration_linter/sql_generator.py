@@ -0,0 +1,368 @@
+import hashlib
+import logging
+
+import django
+from django.db import ProgrammingError
+from django.db.migrations.state import ProjectState
+
+from .constants import MAX_PROJECT_STATES, PROJECT_STATE_CHECKPOINT_INTERVAL
+
+logger = logging.getLogger("django_migration_linter")
+
+
+class SqlGenerator(object):
+    """
+    Generate the SQL of migrations in-process.
+
+    This does what the 'sqlmigrate' command does, but re-uses the same migration
+    loader and database connection for every migration instead of rebuilding
+    them each time.
+
+    The project state is not rebuilt from scratch for each migration either:
+    each app keeps an evolving project state, on which only the missing
+    ancestors of the next migration are applied. The first migration of an app
+    starts from a clone of the biggest kept state made of its ancestors only,
+    e.g. the state of the app it depends on. At most MAX_PROJECT_STATES states
+    are kept, the least recently used ones being dropped. Like with the
+    'migrate' command, the state stays rendered between migrations: on SQLite,
+    re-created tables can hence list their columns in a different order than
+    'sqlmigrate'.
+
+    When project state checkpoints are given, the state after squashed
+    migrations and regularly along the graph is saved, and later states are
+    built from the nearest checkpoint instead of from the first migrations.
+
+    When an SQL cache is given, the generated SQL is stored in it, and the SQL
+    of a migration is only generated again when the migration, one of its
+    ancestors, the database vendor or the Django version changes.
+    """
+
+    def __init__(
+        self,
+        migration_loader,
+        connection,
+        state_checkpoints=None,
+        sql_cache=None,
+        get_migration_hash=None,
+    ):
+        self.migration_loader = migration_loader
+        self.connection = connection
+        self.state_checkpoints = state_checkpoints
+        self.sql_cache = sql_cache
+        self.get_migration_hash = get_migration_hash
+        # Migration node -> key of the project state after that migration
+        self.state_keys = {}
+        # app_label -> (project state, applied migration nodes, last migration node)
+        self.app_states = {}
+        # Migration node -> SQL statements generated in advance
+        self.generated_sql = {}
+        # State of the common ancestors of the migrations generated in advance
+        self.common_state = None
+
+    def get_sql(self, app_label, migration_name):
+        migration = self.migration_loader.get_migration_by_prefix(
+            app_label, migration_name
+        )
+        node = (migration.app_label, migration.name)
+        if node in self.generated_sql:
+            return self.generated_sql.pop(node)
+        sql_statements = self.get_cached_sql(node)
+        if sql_statements is not None:
+            return sql_statements
+        return self.generate_sql(node)
+
+    def generate(self, nodes):
+        """
+        Generate in advance the SQL of the given migration nodes, in
+        topological order, so that the state of each app mostly evolves
+        forwards. Only the ancestors of these migrations are applied.
+        The state of the ancestors shared by all migrations is built only once.
+        """
+        nodes_to_generate = []
+        for node in nodes:
+            sql_statements = self.get_cached_sql(node)
+            if sql_statements is not None:
+                self.generated_sql[node] = sql_statements
+            else:
+                nodes_to_generate.append(node)
+        nodes = nodes_to_generate
+
+        ancestors = self.get_ancestors(nodes)
+        target_nodes = set(nodes)
+        sorted_nodes = [node for node in ancestors if node in target_nodes]
+        self.common_state = self.build_common_state(nodes, ancestors)
+
+        for node in sorted_nodes:
+            try:
+                self.generated_sql[node] = self.generate_sql(node)
+            except (ValueError, ProgrammingError):
+                # The error will be reported when the SQL is requested
+                logger.debug("Could not generate the SQL of %s in advance", node)
+
+        self.app_states.clear()
+        self.common_state = None
+
+    def build_common_state(self, nodes, ancestors):
+        """
+        Build the project state of the migrations that are ancestors of all
+        the given migration nodes, 'ancestors' being all their ancestors sorted
+        in topological order.
+        Return None if the migrations have no common ancestor.
+        """
+        if len(nodes) < 2:
+            return None
+
+        # Bit mask of the target migrations each ancestor is needed by
+        graph = self.migration_loader.graph
+        target_bits = {node: 1 << i for i, node in enumerate(nodes)}
+        all_targets_mask = (1 << len(nodes)) - 1
+        needed_by = dict.fromkeys(ancestors, 0)
+        for node in reversed(ancestors):
+            mask = needed_by[node] | target_bits.get(node, 0)
+            for parent in graph.node_map[node].parents:
+                needed_by[parent.key] |= mask
+
+        common_ancestors = [
+            node for node in ancestors if needed_by[node] == all_targets_mask
+        ]
+        if not common_ancestors:
+            return None
+
+        logger.debug("Building the state of %s common ancestors", len(common_ancestors))
+        return self.build_state(common_ancestors)
+
+    def build_state(self, nodes):
+        """
+        Build the project state of the given migration nodes, which must
+        contain all their ancestors and be sorted in topological order.
+        Return the state and the set of migration nodes applied on it.
+        """
+        graph = self.migration_loader.graph
+        state = None
+        applied = set()
+        if self.state_checkpoints is not None:
+            for node in reversed(nodes):
+                key = self.get_state_key(node)
+                if key in self.state_checkpoints:
+                    state = self.state_checkpoints.load(key)
+                    if state is not None:
+                        logger.debug("Resuming from the state after %s", node)
+                        applied = set(graph.forwards_plan(node))
+                        break
+
+        if state is None:
+            state = ProjectState(real_apps=set(self.migration_loader.unmigrated_apps))
+        for node in nodes:
+            if node not in applied:
+                graph.nodes[node].mutate_state(state, preserve=False)
+                applied.add(node)
+        return state, applied
+
+    def get_state_key(self, node):
+        """
+        Return the key of the project state after the migration node.
+        It hashes the content of the migration and the keys of its parents,
+        so it changes as soon as any migration the state is made of changes,
+        along with the Django version. It doesn't depend on the version of
+        the linter, so the cached SQL survives upgrades of the linter.
+        """
+        if node not in self.state_keys:
+            self.compute_state_keys([node])
+        return self.state_keys[node]
+
+    def compute_state_keys(self, nodes):
+        """
+        Compute the state keys of the given migration nodes in one walk of
+        their ancestors, each key being computed once the keys of its parents
+        are known. The keys already computed are not walked again.
+        """
+        graph = self.migration_loader.graph
+        django_version = django.get_version().encode()
+        for node in self.get_ancestors(nodes, known=self.state_keys):
+            hash_md5 = hashlib.md5()
+            hash_md5.update(django_version)
+            hash_md5.update(self.get_migration_hash(*node).encode())
+            for parent in sorted(graph.node_map[node].parents):
+                hash_md5.update(self.state_keys[parent.key].encode())
+            self.state_keys[node] = hash_md5.hexdigest()
+
+    def get_sql_key(self, node):
+        """
+        Return the key of the SQL of the migration node, which depends on the
+        project state after the migration and on the database vendor.
+        """
+        hash_md5 = hashlib.md5()
+        hash_md5.update(self.get_state_key(node).encode())
+        hash_md5.update(self.connection.vendor.encode())
+        return hash_md5.hexdigest()
+
+    def get_cached_sql(self, node):
+        if self.sql_cache is None:
+            return None
+        sql_statements = self.sql_cache.get(self.get_sql_key(node))
+        if sql_statements is None:
+            return None
+        logger.debug("Using the cached SQL of %s", node)
+        return list(sql_statements)
+
+    def generate_sql(self, node):
+        migration = self.migration_loader.graph.nodes[node]
+        state, applied = self.get_state_before(node)
+        sql_statements = self.collect_sql(migration, state)
+        applied.add(node)
+        self.app_states[node[0]] = (state, applied, node)
+        # Drop the least recently used states beyond the maximum
+        while len(self.app_states) > MAX_PROJECT_STATES:
+            del self.app_states[next(iter(self.app_states))]
+
+        if self.sql_cache is not None:
+            self.sql_cache[self.get_sql_key(node)] = list(sql_statements)
+
+        if self.state_checkpoints is not None and (
+            migration.replaces or len(applied) % PROJECT_STATE_CHECKPOINT_INTERVAL == 0
+        ):
+            self.state_checkpoints.save(self.get_state_key(node), state)
+        return sql_statements
+
+    def get_state_before(self, node):
+        """
+        Return the project state before the given migration node, along with
+        the set of migration nodes that have been applied on it.
+        The state of the node's app is re-used when possible, otherwise the
+        biggest state made of ancestors of the node only is cloned.
+        """
+        graph = self.migration_loader.graph
+
+        # The state is popped since it gets mutated, and it is only put back
+        # once the migration has been successfully applied.
+        app_state = self.app_states.pop(node[0], None)
+        if app_state is not None:
+            state, applied, last_node = app_state
+            missing_ancestors = self.get_missing_ancestors(node, applied, last_node)
+            if missing_ancestors is not None:
+                for ancestor in missing_ancestors:
+                    graph.nodes[ancestor].mutate_state(state, preserve=False)
+                    applied.add(ancestor)
+                return state, applied
+
+        ancestors = graph.forwards_plan(node)[:-1]
+        base_state = self.get_base_state(set(ancestors))
+        if base_state is None:
+            return self.build_state(ancestors)
+
+        state, applied = base_state
+        state, applied = state.clone(), set(applied)
+        for ancestor in ancestors:
+            if ancestor not in applied:
+                graph.nodes[ancestor].mutate_state(state, preserve=False)
+                applied.add(ancestor)
+        return state, applied
+
+    def get_base_state(self, ancestors):
+        """
+        Return the kept project state and applied migration nodes with the
+        most migrations applied, all of them being in 'ancestors', or None.
+        """
+        candidates = [
+            (state, applied) for state, applied, _ in self.app_states.values()
+        ]
+        if self.common_state is not None:
+            candidates.append(self.common_state)
+        base_state = None
+        for state, applied in candidates:
+            if (base_state is None or len(applied) > len(base_state[1])) and (
+                applied <= ancestors
+            ):
+                base_state = (state, applied)
+        return base_state
+
+    def get_missing_ancestors(self, node, applied, last_node=None):
+        """
+        Return, in topological order, the ancestors of the migration node that
+        are not in 'applied'.
+        When 'applied' are all ancestors of 'last_node' (included), return None
+        if 'last_node' is not an ancestor of the migration node, since the state
+        would then contain migrations that shouldn't be applied.
+        """
+        graph = self.migration_loader.graph
+        missing_ancestors = []
+        visited = set()
+        last_node_found = False
+        stack = [(graph.node_map[node], False)]
+        while stack:
+            graph_node, processed = stack.pop()
+            if processed:
+                missing_ancestors.append(graph_node.key)
+                continue
+            if graph_node.key in visited:
+                continue
+            visited.add(graph_node.key)
+            stack.append((graph_node, True))
+            for parent in sorted(graph_node.parents, reverse=True):
+                if parent.key == last_node:
+                    last_node_found = True
+                if parent.key not in applied:
+                    stack.append((parent, False))
+
+        if last_node is not None and not last_node_found:
+            return None
+        # The migration node itself comes last
+        return missing_ancestors[:-1]
+
+    def get_ancestors(self, nodes, known=()):
+        """
+        Return the given migration nodes and all their ancestors,
+        sorted in topological order.
+        The 'known' nodes are left out, and so are their ancestors, which must
+        be known as well.
+        """
+        graph = self.migration_loader.graph
+        ancestors = []
+        visited = set(known)
+        for node in sorted(nodes):
+            stack = [(graph.node_map[node], False)]
+            while stack:
+                graph_node, processed = stack.pop()
+                if processed:
+                    ancestors.append(graph_node.key)
+                    continue
+                if graph_node.key in visited:
+                    continue
+                visited.add(graph_node.key)
+                stack.append((graph_node, True))
+                for parent in sorted(graph_node.parents, reverse=True):
+                    if parent.key not in visited:
+                        stack.append((parent, False))
+        return ancestors
+
+    def collect_sql(self, migration, state):
+        """
+        Apply the migration on the given project state and return the SQL
+        statements, the same way they would be output by 'sqlmigrate'.
+        The project state is mutated to the state after the migration.
+        """
+        with self.connection.schema_editor(
+            collect_sql=True, atomic=migration.atomic
+        ) as schema_editor:
+            migration.apply(state, schema_editor, collect_sql=True)
+        sql_statements = schema_editor.collected_sql
+
+        # Operations that can't be written as SQL are skipped when collecting,
+        # but the state is re-used by the following migrations.
+        for operation in migration.operations:
+            if not operation.reduces_to_sql:
+                operation.state_forwards(migration.app_label, state)
+
+        # Show begin/end around non-empty output for atomic migrations,
+        # if the database supports transactional DDL.
+        if (
+            sql_statements
+            and migration.atomic
+            and self.connection.features.can_rollback_ddl
+        ):
+            sql_statements = (
+                [self.connection.ops.start_transaction_sql()]
+                + sql_statements
+                + [self.connection.ops.end_transaction_sql()]
+            )
+        return sql_statements
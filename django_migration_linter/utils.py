@@ -2,6 +2,7 @@ from __future__ import print_function
 
 import os
 from importlib import import_module
+from subprocess import PIPE, Popen
 
 
 def split_path(path):
@@ -47,3 +48,82 @@ def get_migration_abspath(app_label, migration_name):
     if migration_file.endswith(".pyc"):
         migration_file = migration_file[:-1]
     return migration_file
+
+
+def get_migration_paths(app_label):
+    """
+    Return the paths of the migration files of the app, by migration name.
+    The migrations package, already imported by the migration loader, is listed
+    once instead of importing each migration module.
+    """
+    from django.db.migrations.loader import MigrationLoader
+
+    module_name, _ = MigrationLoader.migrations_module(app_label)
+    if module_name is None:
+        return {}
+    try:
+        migrations_module = import_module(module_name)
+    except ImportError:
+        return {}
+
+    migration_paths = {}
+    for directory in getattr(migrations_module, "__path__", []):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name, extension = os.path.splitext(entry.name)
+                if extension == ".py" and name != "__init__" and entry.is_file():
+                    migration_paths.setdefault(name, entry.path)
+    return migration_paths
+
+
+def run_git(args, directory):
+    """
+    Return the output of the git command run in the directory, or None if
+    it failed, e.g. when the directory is not inside a git checkout.
+    """
+    try:
+        git_process = Popen(["git"] + args, cwd=directory, stdout=PIPE, stderr=PIPE)
+        output, _ = git_process.communicate()
+    except OSError:
+        return None
+    if git_process.returncode != 0:
+        return None
+    return output.decode("utf-8")
+
+
+def get_git_blob_ids(directory):
+    """
+    Return the git blob ids of the Python files tracked in the git checkout
+    of the directory, by absolute path, listed with a single git command.
+    The whole checkout is listed, since the apps of a project are usually not
+    inside the directory of its settings.
+    Files that are modified in the working tree are left out, since their
+    content no longer matches their blob id.
+    Return an empty dict if the directory is not inside a git checkout.
+    """
+    # The relative path of the top-level directory keeps the absolute paths
+    # as seen from the directory, e.g. through symbolic links
+    cdup = run_git(["rev-parse", "--show-cdup"], directory)
+    if cdup is None:
+        return {}
+    top_level = os.path.join(directory, cdup.strip())
+    output = run_git(["ls-files", "--stage", "-t", "-m", "-z", "--", "*.py"], top_level)
+    if output is None:
+        return {}
+
+    blob_ids = {}
+    modified_paths = set()
+    for line in output.split("\0"):
+        if not line:
+            continue
+        info, path = line.split("\t", 1)
+        tag, mode, blob_id, stage = info.split(" ")
+        path = os.path.abspath(os.path.join(top_level, path))
+        if tag == "C":
+            modified_paths.add(path)
+        elif tag == "H" and mode.startswith("100") and stage == "0":
+            blob_ids[path] = blob_id
+
+    for path in modified_paths:
+        blob_ids.pop(path, None)
+    return blob_ids
@@ -1,9 +1,11 @@
 import os
+import tempfile
 import unittest
 import unittest.mock as mock
 
 from django.conf import settings
 from django.db.migrations import Migration
+from django.db.migrations.state import ProjectState
 
 from django_migration_linter import (
     IgnoreMigration,
@@ -11,6 +13,10 @@ from django_migration_linter import (
     analyse_sql_statements,
     get_migration_abspath,
 )
+from django_migration_linter.cache import Cache, CacheFile, ProjectStateCheckpoints
+
+CREATE_TABLE = ("app_add_not_null_column", "0001_create_table")
+ADD_NOT_NULL = ("app_add_not_null_column", "0002_add_new_not_null_field")
 
 
 class OperationsIgnoreMigration(Migration):
@@ -30,8 +36,7 @@ class CacheTestCase(unittest.TestCase):
     )
     def test_cache_normal(self, *args):
         linter = MigrationLinter(self.test_project_path)
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         with mock.patch(
             "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -40,11 +45,10 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             self.assertEqual(2, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
-        self.assertEqual("OK", cache["4a3770a405738d457e2d23e17fb1f3aa"]["result"])
-        self.assertEqual("ERR", cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["result"])
+        self.assertEqual([], cache[linter.get_migration_key(*CREATE_TABLE)]["errors"])
+        self.assertTrue(cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
         self.assertListEqual(
             [
                 {
@@ -54,7 +58,7 @@ class CacheTestCase(unittest.TestCase):
                     "column": None,
                 }
             ],
-            cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["errors"],
+            cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"],
         )
 
         # Start the Linter again -> should use cache now.
@@ -64,8 +68,12 @@ class CacheTestCase(unittest.TestCase):
             "django_migration_linter.migration_linter.analyse_sql_statements",
             wraps=analyse_sql_statements,
         ) as analyse_sql_statements_mock:
-            linter.lint_all_migrations()
+            with mock.patch.object(
+                Cache, "__setitem__", autospec=True
+            ) as cache_setitem_mock:
+                linter.lint_all_migrations()
             analyse_sql_statements_mock.assert_not_called()
+            cache_setitem_mock.assert_not_called()
 
         self.assertTrue(linter.has_errors)
 
@@ -78,12 +86,10 @@ class CacheTestCase(unittest.TestCase):
     )
     def test_cache_different_databases(self, *args):
         linter = MigrationLinter(self.test_project_path, database="mysql")
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         linter = MigrationLinter(self.test_project_path, database="sqlite")
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         with mock.patch(
             "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -92,11 +98,10 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             self.assertEqual(2, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
-        self.assertEqual("OK", cache["4a3770a405738d457e2d23e17fb1f3aa"]["result"])
-        self.assertEqual("ERR", cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["result"])
+        self.assertEqual([], cache[linter.get_migration_key(*CREATE_TABLE)]["errors"])
+        self.assertTrue(cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
         self.assertListEqual(
             [
                 {
@@ -106,7 +111,7 @@ class CacheTestCase(unittest.TestCase):
                     "column": None,
                 }
             ],
-            cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["errors"],
+            cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"],
         )
 
         # Start the Linter again but with different database, should not be the same cache
@@ -119,25 +124,370 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             self.assertEqual(2, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
-        self.assertEqual("OK", cache["4a3770a405738d457e2d23e17fb1f3aa"]["result"])
-        self.assertEqual("ERR", cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["result"])
+        self.assertEqual([], cache[linter.get_migration_key(*CREATE_TABLE)]["errors"])
+        self.assertTrue(cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
         self.assertListEqual(
             [
                 {
                     "msg": "NOT NULL constraint on columns",
                     "code": "NOT_NULL",
-                    "table": None,
-                    "column": None,
+                    "table": "app_add_not_null_column_a",
+                    "column": "new_not_null_field",
                 }
             ],
-            cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["errors"],
+            cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"],
         )
 
         self.assertTrue(linter.has_errors)
 
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_sql_cache(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.cache.clear()
+        linter.sql_cache.clear()
+
+        linter.lint_all_migrations()
+        self.assertTrue(linter.has_errors)
+
+        self.assertEqual(2, len(linter.sql_cache))
+
+        # Analyse the migrations again, with other tests but the cached SQL
+        linter = MigrationLinter(
+            self.test_project_path, exclude_migration_tests=["NOT_NULL"]
+        )
+        linter.cache.clear()
+
+        with mock.patch.object(linter.sql_generator, "collect_sql") as collect_sql_mock:
+            linter.lint_all_migrations()
+            collect_sql_mock.assert_not_called()
+
+        self.assertFalse(linter.has_errors)
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_cache_different_options(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.cache.clear()
+        linter.lint_all_migrations()
+        self.assertTrue(linter.has_errors)
+
+        # The cached findings are used with other migration tests
+        linter = MigrationLinter(
+            self.test_project_path, exclude_migration_tests=["NOT_NULL"]
+        )
+        with mock.patch(
+            "django_migration_linter.migration_linter.analyse_sql_statements",
+            wraps=analyse_sql_statements,
+        ) as analyse_sql_statements_mock:
+            linter.lint_all_migrations()
+            analyse_sql_statements_mock.assert_not_called()
+
+        self.assertFalse(linter.has_errors)
+        self.assertEqual(2, linter.nb_valid)
+        self.assertTrue(linter.cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_sql_cache_new_linter_version(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.lint_all_migrations()
+
+        # Upgrading the linter analyses the cached SQL again
+        with mock.patch("django_migration_linter.constants.__version__", "99.0.0"):
+            linter = MigrationLinter(self.test_project_path)
+            with mock.patch(
+                "django_migration_linter.migration_linter.analyse_sql_statements",
+                wraps=analyse_sql_statements,
+            ) as analyse_sql_statements_mock, mock.patch.object(
+                linter.sql_generator, "collect_sql"
+            ) as collect_sql_mock:
+                linter.lint_all_migrations()
+                self.assertEqual(2, analyse_sql_statements_mock.call_count)
+                collect_sql_mock.assert_not_called()
+        self.assertTrue(linter.has_errors)
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_cache_different_analyser(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.cache.clear()
+        linter.lint_all_migrations()
+        key = linter.get_migration_key(*ADD_NOT_NULL)
+        sql_key = linter.sql_generator.get_sql_key(ADD_NOT_NULL)
+        self.assertNotEqual(sql_key, key)
+
+        # The findings of another analyser are not re-used, but the SQL is
+        linter = MigrationLinter(self.test_project_path, analyser_string="mysql")
+        self.assertNotEqual(key, linter.get_migration_key(*ADD_NOT_NULL))
+        self.assertEqual(sql_key, linter.sql_generator.get_sql_key(ADD_NOT_NULL))
+        with mock.patch(
+            "django_migration_linter.migration_linter.analyse_sql_statements",
+            wraps=analyse_sql_statements,
+        ) as analyse_sql_statements_mock, mock.patch.object(
+            linter.sql_generator, "collect_sql"
+        ) as collect_sql_mock:
+            linter.lint_all_migrations()
+            self.assertEqual(2, analyse_sql_statements_mock.call_count)
+            collect_sql_mock.assert_not_called()
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_file_hash_cache(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.git_blob_ids = {}
+        linter.lint_all_migrations()
+
+        # Files that did not change are not read again
+        linter = MigrationLinter(self.test_project_path)
+        linter.git_blob_ids = {}
+        with mock.patch.object(MigrationLinter, "get_file_hash") as get_file_hash_mock:
+            linter.lint_all_migrations()
+            get_file_hash_mock.assert_not_called()
+
+        self.assertEqual(
+            "e1cffb4c0c7fca5c4e5f9a37f66f53da9c9e9599",
+            linter.hash_migration_file(
+                "app_add_not_null_column", "0002_add_new_not_null_field"
+            ),
+        )
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_git_blob_ids(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        if not linter.git_blob_ids:
+            self.skipTest("The test project is not in a git checkout")
+
+        # Migration files tracked by git are not read
+        with mock.patch.object(MigrationLinter, "get_file_hash") as get_file_hash_mock:
+            linter.lint_all_migrations()
+            get_file_hash_mock.assert_not_called()
+
+        self.assertTrue(linter.cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
+
+    def test_cache_concurrent_runs(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            cache = Cache(self.test_project_path, "default", cache_path)
+            other_cache = Cache(self.test_project_path, "default", cache_path)
+            cache["0001_create_table"] = {
+                "errors": [],
+                "warnings": [],
+            }
+            other_cache["0002_add_new_not_null_field"] = {
+                "errors": [
+                    {"msg": "NOT NULL constraint on columns", "code": "NOT_NULL"}
+                ],
+                "warnings": [],
+            }
+            cache.save()
+            other_cache.save()
+
+            cache = Cache(self.test_project_path, "default", cache_path)
+            self.assertEqual(2, len(cache))
+            self.assertEqual([], cache["0001_create_table"]["errors"])
+            self.assertTrue(cache["0002_add_new_not_null_field"]["errors"])
+
+            # A key that was looked up and missed still counts once it is set
+            self.assertNotIn("0003_make_not_null_with_django_default", cache)
+            cache["0003_make_not_null_with_django_default"] = {
+                "errors": [],
+                "warnings": [],
+            }
+            self.assertEqual(3, len(cache))
+            cache.close()
+            other_cache.close()
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_shared_cache(self, *args):
+        with tempfile.TemporaryDirectory() as cache_path, tempfile.TemporaryDirectory() as shared_cache_path:
+            linter = MigrationLinter(
+                self.test_project_path,
+                cache_path=cache_path,
+                shared_cache_path=shared_cache_path,
+            )
+            linter.lint_all_migrations()
+            self.assertTrue(linter.has_errors)
+
+            # One file per entry, in a subfolder named after the key
+            key = linter.get_migration_key(*ADD_NOT_NULL)
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(shared_cache_path, key[:2], "{}.json".format(key))
+                )
+            )
+
+            # Another run starts with an empty cache but the shared one
+            with tempfile.TemporaryDirectory() as other_cache_path:
+                linter = MigrationLinter(
+                    self.test_project_path,
+                    cache_path=other_cache_path,
+                    shared_cache_path=shared_cache_path,
+                )
+                with mock.patch(
+                    "django_migration_linter.migration_linter.analyse_sql_statements",
+                    wraps=analyse_sql_statements,
+                ) as analyse_sql_statements_mock, mock.patch.object(
+                    linter.sql_generator, "collect_sql"
+                ) as collect_sql_mock:
+                    linter.lint_all_migrations()
+                    analyse_sql_statements_mock.assert_not_called()
+                    collect_sql_mock.assert_not_called()
+
+                self.assertTrue(linter.has_errors)
+                self.assertEqual(2, len(linter.cache))
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0001_create_table", "app_add_not_null_column"),
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column"),
+        ],
+    )
+    def test_export_import_cache(self, *args):
+        with tempfile.TemporaryDirectory() as cache_path, tempfile.TemporaryDirectory() as other_cache_path:
+            linter = MigrationLinter(self.test_project_path, cache_path=cache_path)
+            linter.lint_all_migrations()
+            bundle_filename = os.path.join(cache_path, "bundle.json.gz")
+            linter.export_cache(bundle_filename)
+
+            # The bundle is imported in the cache of another project path
+            linter = MigrationLinter(
+                self.test_project_path + os.sep, cache_path=other_cache_path
+            )
+            self.assertEqual(4, linter.import_cache(bundle_filename))
+            self.assertEqual(0, linter.import_cache(bundle_filename))
+            with mock.patch(
+                "django_migration_linter.migration_linter.analyse_sql_statements",
+                wraps=analyse_sql_statements,
+            ) as analyse_sql_statements_mock:
+                linter.lint_all_migrations()
+                analyse_sql_statements_mock.assert_not_called()
+            self.assertTrue(linter.has_errors)
+
+            # The generated SQL is imported as well
+            linter = MigrationLinter(
+                self.test_project_path + os.sep,
+                cache_path=other_cache_path,
+                exclude_migration_tests=["NOT_NULL"],
+            )
+            linter.cache.clear()
+            with mock.patch.object(
+                linter.sql_generator, "collect_sql"
+            ) as collect_sql_mock:
+                linter.lint_all_migrations()
+                collect_sql_mock.assert_not_called()
+            self.assertFalse(linter.has_errors)
+
+            with mock.patch("django_migration_linter.constants.__version__", "0.0.0"):
+                with self.assertRaises(ValueError):
+                    linter.import_cache(bundle_filename)
+
+    def test_state_checkpoint_atomic_write(self):
+        state = ProjectState()
+        with tempfile.TemporaryDirectory() as cache_path:
+            state_checkpoints = ProjectStateCheckpoints(cache_path)
+
+            # An interrupted write leaves neither a checkpoint nor a partial file
+            with mock.patch(
+                "django_migration_linter.cache.os.replace", side_effect=OSError
+            ):
+                state_checkpoints.save("interrupted", state)
+            self.assertNotIn("interrupted", state_checkpoints)
+            self.assertEqual([], os.listdir(state_checkpoints.directory))
+
+            state_checkpoints.save("saved", state)
+            self.assertEqual(["saved.pickle"], os.listdir(state_checkpoints.directory))
+            state_checkpoints = ProjectStateCheckpoints(cache_path)
+            self.assertIn("saved", state_checkpoints)
+            self.assertIsNotNone(state_checkpoints.load("saved"))
+
+    def test_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            cache = Cache(self.test_project_path, "default", cache_path)
+            cache["old"] = {"errors": [], "warnings": []}
+            cache["hit"] = {"errors": [], "warnings": []}
+            cache["new"] = {"errors": [], "warnings": []}
+            cache.save()
+            cache.connection.execute(
+                "UPDATE lint_findings SET last_seen = 0 WHERE key IN ('old', 'hit')"
+            )
+            cache.connection.commit()
+            cache.close()
+
+            # Entries that were not hit for too long are evicted
+            cache = Cache(self.test_project_path, "default", cache_path)
+            self.assertIn("hit", cache)
+            self.assertNotIn("missing", cache)
+            cache.save()
+            self.assertEqual(2, len(cache))
+            self.assertNotIn(
+                "old", Cache(self.test_project_path, "default", cache_path)
+            )
+
+            # Beyond the maximum size, the least recently hit entries are evicted
+            cache.connection.execute(
+                "UPDATE lint_findings SET last_seen = last_seen - 1 WHERE key = 'new'"
+            )
+            cache.connection.commit()
+            with mock.patch(
+                "django_migration_linter.constants.CACHE_MAX_SIZE",
+                len('{"errors": [], "warnings": []}'),
+            ):
+                cache.save()
+            self.assertEqual(1, len(cache))
+
+            cache_file = CacheFile.list(cache_path)[0]
+            self.assertEqual(cache.filename, cache_file.filename)
+            self.assertEqual(
+                {"entries": 1, "hits": 1, "misses": 1}, cache_file.get_stats()
+            )
+            cache.close()
+
+            # Pruning the cache deletes it once it is empty
+            with mock.patch("django_migration_linter.constants.CACHE_MAX_AGE", -1):
+                self.assertEqual(1, cache_file.prune())
+            self.assertFalse(os.path.exists(cache_file.filename))
+            self.assertEqual([], CacheFile.list(cache_path))
+
     @mock.patch(
         "django_migration_linter.MigrationLinter._gather_all_migrations",
         return_value=[
@@ -147,8 +497,7 @@ class CacheTestCase(unittest.TestCase):
     )
     def test_cache_ignored(self, *args):
         linter = MigrationLinter(self.test_project_path, ignore_name_contains="0001")
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         with mock.patch(
             "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -157,8 +506,7 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             analyse_sql_statements_mock.assert_not_called()
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
         self.assertFalse(cache)
 
@@ -170,8 +518,7 @@ class CacheTestCase(unittest.TestCase):
     )
     def test_cache_modified(self, *args):
         linter = MigrationLinter(self.test_project_path)
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         with mock.patch(
             "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -180,13 +527,13 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             self.assertEqual(1, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
-        self.assertEqual("ERR", cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["result"])
+        migration_key = linter.get_migration_key(*ADD_NOT_NULL)
+        self.assertTrue(cache[migration_key]["errors"])
 
         # Get the content of the migration file and mock the open call to append
-        # some content to change the hash
+        # some content to change the hash, as well as the stat of the file
         migration_path = get_migration_abspath(
             "app_add_not_null_column", "0002_add_new_not_null_field"
         )
@@ -195,9 +542,13 @@ class CacheTestCase(unittest.TestCase):
         file_content += b"# test comment"
 
         linter = MigrationLinter(self.test_project_path)
+        # The file is not the one tracked by git anymore
+        linter.git_blob_ids = {}
         with mock.patch(
             "django_migration_linter.migration_linter.open",
             mock.mock_open(read_data=file_content),
+        ), mock.patch.object(
+            MigrationLinter, "get_file_stat", return_value=[len(file_content), 0, 0]
         ):
             with mock.patch(
                 "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -206,12 +557,49 @@ class CacheTestCase(unittest.TestCase):
                 linter.lint_all_migrations()
                 self.assertEqual(1, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
+
+        # The entry of the previous content is kept until it is evicted
+        self.assertNotEqual(migration_key, linter.get_migration_key(*ADD_NOT_NULL))
+        self.assertEqual(2, len(cache))
+        self.assertTrue(cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
+
+    @mock.patch(
+        "django_migration_linter.MigrationLinter._gather_all_migrations",
+        return_value=[
+            Migration("0002_add_new_not_null_field", "app_add_not_null_column")
+        ],
+    )
+    def test_cache_ancestor_modified(self, *args):
+        linter = MigrationLinter(self.test_project_path)
+        linter.cache.clear()
+        linter.lint_all_migrations()
+        migration_key = linter.get_migration_key(*ADD_NOT_NULL)
+        self.assertIn(migration_key, linter.cache)
+
+        # Modifying an ancestor invalidates the findings of the migration
+        hash_migration_file = MigrationLinter.hash_migration_file
+
+        def modified_hash_migration_file(linter, app_label, migration_name):
+            file_hash = hash_migration_file(linter, app_label, migration_name)
+            if (app_label, migration_name) == CREATE_TABLE:
+                return "modified-" + file_hash
+            return file_hash
+
+        with mock.patch.object(
+            MigrationLinter, "hash_migration_file", modified_hash_migration_file
+        ):
+            linter = MigrationLinter(self.test_project_path)
+            self.assertNotEqual(migration_key, linter.get_migration_key(*ADD_NOT_NULL))
+            with mock.patch(
+                "django_migration_linter.migration_linter.analyse_sql_statements",
+                wraps=analyse_sql_statements,
+            ) as analyse_sql_statements_mock:
+                linter.lint_all_migrations()
+                self.assertEqual(1, analyse_sql_statements_mock.call_count)
 
-        self.assertNotIn("19fd3ea688fc05e2cc2a6e67c0b7aa17", cache)
-        self.assertEqual(1, len(cache))
-        self.assertEqual("ERR", cache["a25768641a0ad526fad199f97c303784"]["result"])
+        self.assertTrue(linter.has_errors)
+        self.assertIn(linter.get_migration_key(*ADD_NOT_NULL), linter.cache)
 
     @mock.patch(
         "django_migration_linter.MigrationLinter._gather_all_migrations",
@@ -222,8 +610,7 @@ class CacheTestCase(unittest.TestCase):
     )
     def test_ignore_cached_migration(self, *args):
         linter = MigrationLinter(self.test_project_path)
-        linter.old_cache.clear()
-        linter.old_cache.save()
+        linter.cache.clear()
 
         with mock.patch(
             "django_migration_linter.migration_linter.analyse_sql_statements",
@@ -232,11 +619,10 @@ class CacheTestCase(unittest.TestCase):
             linter.lint_all_migrations()
             self.assertEqual(2, analyse_sql_statements_mock.call_count)
 
-        cache = linter.new_cache
-        cache.load()
+        cache = linter.cache
 
-        self.assertEqual("OK", cache["4a3770a405738d457e2d23e17fb1f3aa"]["result"])
-        self.assertEqual("ERR", cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["result"])
+        self.assertEqual([], cache[linter.get_migration_key(*CREATE_TABLE)]["errors"])
+        self.assertTrue(cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"])
         self.assertListEqual(
             [
                 {
@@ -246,7 +632,7 @@ class CacheTestCase(unittest.TestCase):
                     "column": None,
                 }
             ],
-            cache["19fd3ea688fc05e2cc2a6e67c0b7aa17"]["errors"],
+            cache[linter.get_migration_key(*ADD_NOT_NULL)]["errors"],
         )
 
         # Start the Linter again -> should use cache now but ignore the erroneous
@@ -263,7 +649,7 @@ class CacheTestCase(unittest.TestCase):
 
         self.assertFalse(linter.has_errors)
 
-        cache = linter.new_cache
-        cache.load()
-        self.assertEqual(1, len(cache))
-        self.assertEqual("OK", cache["4a3770a405738d457e2d23e17fb1f3aa"]["result"])
+        # The entry of the ignored migration is kept until it is evicted
+        cache = linter.cache
+        self.assertEqual(2, len(cache))
+        self.assertEqual([], cache[linter.get_migration_key(*CREATE_TABLE)]["errors"])
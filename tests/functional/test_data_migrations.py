@@ -288,13 +288,13 @@ class RunSQLMigrationTestCase(unittest.TestCase):
     def test_missing_reserve_migration(self):
         runsql = migrations.RunSQL("sql;")
 
-        error, ignored, warning = self.linter.lint_runsql(runsql)
+        error, warning = self.linter.lint_runsql(runsql)
         self.assertEqual("RUNSQL_REVERSIBLE", warning[0]["code"])
 
     def test_sql_linting_error(self):
         runsql = migrations.RunSQL("ALTER TABLE t DROP COLUMN t;")
 
-        error, ignored, warning = self.linter.lint_runsql(runsql)
+        error, warning = self.linter.lint_runsql(runsql)
         self.assertEqual("DROP_COLUMN", error[0]["code"])
 
     def test_sql_linting_error_array(self):
@@ -302,12 +302,12 @@ class RunSQLMigrationTestCase(unittest.TestCase):
             ["ALTER TABLE t DROP COLUMN c;", "ALTER TABLE t RENAME COLUMN c;"]
         )
 
-        error, ignored, warning = self.linter.lint_runsql(runsql)
+        error, warning = self.linter.lint_runsql(runsql)
         self.assertEqual("DROP_COLUMN", error[0]["code"])
         self.assertEqual("RENAME_COLUMN", error[1]["code"])
 
     def test_sql_linting_error_args(self):
         runsql = migrations.RunSQL([("ALTER TABLE %s DROP COLUMN %s;", ("t", "c"))])
 
-        error, ignored, warning = self.linter.lint_runsql(runsql)
+        error, warning = self.linter.lint_runsql(runsql)
         self.assertEqual("DROP_COLUMN", error[0]["code"])
@@ -1,6 +1,9 @@
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test import TransactionTestCase
 from django.test.utils import override_settings
 
@@ -34,3 +37,76 @@ class LintMigrationsCommandTestCase(TransactionTestCase):
     @override_settings(MIGRATION_LINTER_OPTIONS={"app_label": "app_correct"})
     def test_django_settings_option(self):
         call_command("lintmigrations")
+
+    def test_cache_stats_and_prune(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            call_command(
+                "lintmigrations", app_label="app_correct", cache_path=cache_path
+            )
+
+            out = StringIO()
+            call_command(
+                "lintmigrations", cache_path=cache_path, cache_stats=True, stdout=out
+            )
+            self.assertIn(".sqlite3: ", out.getvalue())
+            self.assertIn("hit rate", out.getvalue())
+
+            legacy_filename = os.path.join(cache_path, "project_default.pickle")
+            open(legacy_filename, "wb").close()
+
+            out = StringIO()
+            with patch("django_migration_linter.constants.CACHE_MAX_AGE", -1):
+                call_command(
+                    "lintmigrations",
+                    cache_path=cache_path,
+                    cache_prune=True,
+                    stdout=out,
+                )
+            self.assertIn(".sqlite3: deleted", out.getvalue())
+            self.assertFalse(os.path.exists(legacy_filename))
+            self.assertFalse(
+                [f for f in os.listdir(cache_path) if f.endswith(".sqlite3")]
+            )
+
+    def test_export_import_cache(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            bundle_filename = os.path.join(cache_path, "bundle.json.gz")
+            call_command(
+                "lintmigrations",
+                app_label="app_correct",
+                cache_path=cache_path,
+                export_cache=bundle_filename,
+            )
+            self.assertTrue(os.path.exists(bundle_filename))
+
+            with tempfile.TemporaryDirectory() as other_cache_path:
+                call_command(
+                    "lintmigrations",
+                    app_label="app_correct",
+                    cache_path=other_cache_path,
+                    import_cache=bundle_filename,
+                )
+
+    def test_cache_stats_empty_cache(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            for option in ("cache_stats", "cache_prune"):
+                call_command(
+                    "lintmigrations",
+                    cache_path=cache_path,
+                    stdout=StringIO(),
+                    **{option: True}
+                )
+            self.assertEqual([], os.listdir(cache_path))
+
+    def test_export_import_cache_no_cache(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            bundle_filename = os.path.join(cache_path, "bundle.json.gz")
+            for option in ("export_cache", "import_cache"):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        "lintmigrations",
+                        app_label="app_correct",
+                        no_cache=True,
+                        **{option: bundle_filename}
+                    )
+            self.assertFalse(os.path.exists(bundle_filename))
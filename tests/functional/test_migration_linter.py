@@ -8,6 +8,8 @@ from tests import fixtures
 
 
 class BaseBackwardCompatibilityDetection(object):
+    offline = False
+
     def setUp(self, *args, **kwargs):
         self.test_project_path = os.path.dirname(settings.BASE_DIR)
         return super(BaseBackwardCompatibilityDetection, self).setUp(*args, **kwargs)
@@ -27,6 +29,7 @@ class BaseBackwardCompatibilityDetection(object):
             self.test_project_path,
             database=next(iter(self.databases)),
             no_cache=True,
+            offline=self.offline,
         )
         linter.lint_all_migrations(app_label=app, git_commit_id=commit_id)
         return linter
@@ -111,6 +114,12 @@ class SqliteBackwardCompatibilityDetectionTestCase(
         self._test_linter_finds_errors(app)
 
 
+class SqliteOfflineBackwardCompatibilityDetectionTestCase(
+    SqliteBackwardCompatibilityDetectionTestCase
+):
+    offline = True
+
+
 class MySqlBackwardCompatibilityDetectionTestCase(
     BaseBackwardCompatibilityDetection, unittest.TestCase
 ):
@@ -125,3 +134,9 @@ class PostgresqlBackwardCompatibilityDetectionTestCase(
     def test_detect_alter_column(self):
         app = fixtures.ALTER_COLUMN
         self._test_linter_finds_errors(app)
+
+
+class PostgresqlOfflineBackwardCompatibilityDetectionTestCase(
+    PostgresqlBackwardCompatibilityDetectionTestCase
+):
+    offline = True
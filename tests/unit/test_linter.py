@@ -1,19 +1,119 @@
 import tempfile
 import unittest
+import unittest.mock as mock
+from io import StringIO
 
+from django.core.management import call_command
 from django.db.migrations import Migration
+from django.db.migrations.operations import RunSQL
 
 from django_migration_linter import MigrationLinter
+from django_migration_linter.sql_analyser import (
+    PostgresqlAnalyser,
+    split_sql_statements,
+)
 
 
 class LinterFunctionsTestCase(unittest.TestCase):
     def test_get_sql(self):
         linter = MigrationLinter()
         sql_statements = linter.get_sql("app_add_not_null_column", "0001")
-        self.assertEqual(len(sql_statements), 6)
+        self.assertEqual(len(sql_statements), 3)
         self.assertEqual(sql_statements[0], "BEGIN;")
+        self.assertTrue(sql_statements[1].startswith("CREATE TABLE"))
         self.assertEqual(sql_statements[-1], "COMMIT;")
 
+    def test_split_sql_statements(self):
+        linter = MigrationLinter()
+        self.assertEqual(
+            [
+                "UPDATE a SET b = 'x;\n--y';",
+                'CREATE TABLE "a;b" ( "id" integer );',
+                "SELECT 1",
+            ],
+            linter.split_sql_statements(
+                [
+                    "--\n-- Add field b\n--\nUPDATE a SET b = 'x;\n--y';",
+                    'CREATE TABLE "a;b" (\n    "id" integer\n); /* ; */ ;\n',
+                    "SELECT 1 -- trailing comment",
+                ]
+            ),
+        )
+
+    def test_lint_multi_line_runsql(self):
+        linter = MigrationLinter()
+        linter.sql_analyser_class = PostgresqlAnalyser
+        linter.sql_analyser = PostgresqlAnalyser()
+        errors, _ = linter.lint_runsql(
+            RunSQL(
+                'ALTER TABLE "foo"\n    RENAME TO "bar";\n'
+                'ALTER TABLE "bar" -- Change the type\n'
+                '  ALTER COLUMN "x" TYPE int;',
+                RunSQL.noop,
+            )
+        )
+        self.assertEqual(
+            ["RENAME_TABLE", "ALTER_COLUMN"], [error["code"] for error in errors]
+        )
+
+    def test_get_sql_same_as_sqlmigrate(self):
+        linter = MigrationLinter()
+        for app_label, migration_name in (
+            ("app_add_not_null_column", "0002_add_new_not_null_field"),
+            ("app_rename_table", "0002_auto_20190414_1500"),
+            ("app_data_migrations", "0002_missing_reverse"),
+        ):
+            sqlmigrate_output = call_command(
+                "sqlmigrate", app_label, migration_name, stdout=StringIO()
+            )
+            self.assertEqual(
+                list(split_sql_statements(sqlmigrate_output)),
+                linter.get_sql(app_label, migration_name),
+            )
+
+    def test_lint_in_parallel(self):
+        include_apps = (
+            "app_add_not_null_column",
+            "app_correct",
+            "app_data_migrations",
+        )
+        linter = MigrationLinter(no_cache=True, include_apps=include_apps)
+        linter.lint_all_migrations()
+
+        parallel_linter = MigrationLinter(
+            no_cache=True, include_apps=include_apps, jobs=2
+        )
+        with mock.patch.object(
+            parallel_linter.sql_generator, "generate"
+        ) as generate_mock:
+            parallel_linter.lint_all_migrations()
+            generate_mock.assert_not_called()
+        self.assertFalse(parallel_linter.analysed_migrations)
+
+        for counter in (
+            "nb_valid",
+            "nb_ignored",
+            "nb_warnings",
+            "nb_erroneous",
+            "nb_total",
+        ):
+            self.assertEqual(
+                getattr(linter, counter), getattr(parallel_linter, counter)
+            )
+
+    def test_offline(self):
+        linter = MigrationLinter(offline=True)
+        self.assertTrue(
+            any(
+                sql.startswith("CREATE TABLE")
+                for sql in linter.get_sql("app_add_not_null_column", "0001")
+            )
+        )
+        self.assertIsNone(linter.sql_generator.connection.connection)
+
+        with self.assertRaises(ValueError):
+            MigrationLinter(offline=True, only_applied_migrations=True)
+
     def test_has_errors(self):
         linter = MigrationLinter(database="mysql")
         self.assertFalse(linter.has_errors)
@@ -79,18 +179,36 @@ class LinterFunctionsTestCase(unittest.TestCase):
 
     def test_ignore_unapplied_migrations(self):
         linter = MigrationLinter(only_applied_migrations=True)
-        linter.migration_loader.applied_migrations = {("app_correct", "0002_foo")}
+        linter.applied_migrations = {("app_correct", "0002_foo")}
 
         self.assertTrue(linter.should_ignore_migration("app_correct", "0001_initial"))
         self.assertFalse(linter.should_ignore_migration("app_correct", "0002_foo"))
 
     def test_ignore_applied_migrations(self):
         linter = MigrationLinter(only_unapplied_migrations=True)
-        linter.migration_loader.applied_migrations = {("app_correct", "0002_foo")}
+        linter.applied_migrations = {("app_correct", "0002_foo")}
 
         self.assertFalse(linter.should_ignore_migration("app_correct", "0001_initial"))
         self.assertTrue(linter.should_ignore_migration("app_correct", "0002_foo"))
 
+    def test_applied_migrations_lookup_is_lazy(self):
+        with mock.patch(
+            "django_migration_linter.migration_linter.MigrationRecorder"
+        ) as recorder_mock:
+            recorder_mock.return_value.applied_migrations.return_value = {
+                ("app_correct", "0002_foo"): None
+            }
+            linter = MigrationLinter()
+            self.assertFalse(linter.should_ignore_migration("app_correct", "0002_foo"))
+            recorder_mock.assert_not_called()
+
+            linter = MigrationLinter(only_applied_migrations=True)
+            self.assertFalse(linter.should_ignore_migration("app_correct", "0002_foo"))
+            self.assertTrue(
+                linter.should_ignore_migration("app_correct", "0001_initial")
+            )
+            recorder_mock.assert_called_once()
+
     def test_exclude_migration_tests(self):
         m = Migration("0002_add_new_not_null_field", "app_add_not_null_column")
 
@@ -1,9 +1,19 @@
+import re
 import unittest
 
 from django_migration_linter.sql_analyser import (
+    BaseAnalyser,
+    Finding,
+    PostgresqlAnalyser,
+    SqliteAnalyser,
     analyse_sql_statements,
     get_sql_analyser_class,
 )
+from django_migration_linter.sql_analyser.statement import (
+    Statement,
+    split_sql_statements,
+    tokenize,
+)
 
 
 class SqlAnalyserTestCase(unittest.TestCase):
@@ -238,6 +248,14 @@ class PostgresqlAnalyserTestCase(SqlAnalyserTestCase):
         ]
         self.assertValidSql(sql)
 
+        # Each unique index is checked against its own table
+        sql = [
+            'CREATE TABLE "table" ("col1" integer, "col2" integer);',
+            'CREATE UNIQUE INDEX "index_name" ON "table" ("col1", "col2");',
+            'CREATE UNIQUE INDEX CONCURRENTLY "other_name" ON "other" ("col1");',
+        ]
+        self.assertBackwardIncompatibleSql(sql, "ADD_UNIQUE")
+
     def test_add_many_to_many_field(self):
         sql = [
             'CREATE TABLE "app_add_manytomany_field_b_many_to_many"("id" serial NOT NULL PRIMARY KEY, "b_id" integer NOT NULL, "a_id" integer NOT NULL);',
@@ -297,6 +315,21 @@ class PostgresqlAnalyserTestCase(SqlAnalyserTestCase):
         sql = "CREATE UNIQUE INDEX CONCURRENTLY title_idx ON films (title);"
         self.assertValidSql(sql)
 
+    def test_add_unique_column(self):
+        sql = 'ALTER TABLE "films" ADD COLUMN "code" text UNIQUE CONSTRAINT "u";'
+        self.assertBackwardIncompatibleSql(sql, "ADD_UNIQUE_COLUMN")
+        sql = [
+            'CREATE TABLE "films" ("id" integer);',
+            'ALTER TABLE "films" ADD COLUMN "code" text UNIQUE CONSTRAINT "u";',
+        ]
+        errors, _, _ = self.analyse_sql(sql)
+        self.assertNotIn("ADD_UNIQUE_COLUMN", [error["code"] for error in errors])
+
+        # Only unique constraints declared as such are reported
+        sql = 'ALTER TABLE "films" ADD COLUMN "code" varchar(10) NULL UNIQUE;'
+        errors, _, _ = self.analyse_sql(sql)
+        self.assertNotIn("ADD_UNIQUE_COLUMN", [error["code"] for error in errors])
+
     def test_drop_index_non_concurrently(self):
         sql = "DROP INDEX ON films"
         self.assertWarningSql(sql)
@@ -310,3 +343,361 @@ class PostgresqlAnalyserTestCase(SqlAnalyserTestCase):
         self.assertWarningSql(sql)
         sql = "REINDEX TABLE my_table;"
         self.assertWarningSql(sql)
+
+    def test_not_null_columns(self):
+        # The default is set on another column
+        sql = [
+            'ALTER TABLE "a" ALTER COLUMN "other" SET DEFAULT 1;',
+            'ALTER TABLE "a" ALTER COLUMN "col" SET NOT NULL;',
+        ]
+        errors, _, _ = self.analyse_sql(sql)
+        self.assertEqual(
+            [("NOT_NULL", "a", "col")],
+            [(error["code"], error["table"], error["column"]) for error in errors],
+        )
+
+        sql = [
+            'ALTER TABLE "a" ADD COLUMN "b" integer DEFAULT 1 NOT NULL;',
+            'ALTER TABLE "a" ADD COLUMN "c" integer DEFAULT 1 NOT NULL;',
+            'ALTER TABLE "a" ALTER COLUMN "b" DROP DEFAULT;',
+            'ALTER TABLE "a" ALTER COLUMN "c" DROP DEFAULT;',
+            'ALTER TABLE "a" ALTER COLUMN "c" DROP NOT NULL;',
+        ]
+        errors, _, _ = self.analyse_sql(sql)
+        self.assertEqual(
+            [("NOT_NULL", "a", "b")],
+            [(error["code"], error["table"], error["column"]) for error in errors],
+        )
+
+        # The table is created in the same migration
+        sql = [
+            'CREATE TABLE "b" ("id" integer NOT NULL PRIMARY KEY);',
+            'ALTER TABLE "b" ADD COLUMN "c" integer DEFAULT 1 NOT NULL;',
+            'ALTER TABLE "b" ALTER COLUMN "c" DROP DEFAULT;',
+        ]
+        self.assertValidSql(sql)
+
+        # Each action of a statement applies to its own column
+        for sql in (
+            'ALTER TABLE "a" ADD COLUMN "x" int NULL, ADD COLUMN "y" int NOT NULL;',
+            'ALTER TABLE "a" ADD COLUMN "x" int DEFAULT 1 NULL, '
+            'ADD COLUMN "y" int NOT NULL;',
+        ):
+            errors, _, _ = self.analyse_sql([sql])
+            self.assertEqual(
+                [("NOT_NULL", "a", "y")],
+                [(error["code"], error["table"], error["column"]) for error in errors],
+            )
+
+        sql = [
+            'ALTER TABLE "a" ADD COLUMN "x" int DEFAULT 1 NOT NULL, '
+            'ALTER COLUMN "y" SET DEFAULT 1;',
+            'ALTER TABLE "a" ALTER COLUMN "x" DROP DEFAULT, '
+            'ALTER COLUMN "y" SET NOT NULL;',
+        ]
+        errors, _, _ = self.analyse_sql(sql)
+        self.assertEqual(
+            [("NOT_NULL", "a", "x")],
+            [(error["code"], error["table"], error["column"]) for error in errors],
+        )
+
+
+class MigrationTestTableTestCase(unittest.TestCase):
+    def test_migration_test_table(self):
+        table = SqliteAnalyser.migration_test_table
+        self.assertIs(table, SqliteAnalyser(None).migration_test_table)
+        self.assertEqual(
+            len(BaseAnalyser.base_migration_tests),
+            len(table),
+        )
+        self.assertEqual(
+            len(table),
+            len(SqliteAnalyser.one_line_migration_tests)
+            + len(SqliteAnalyser.transaction_migration_tests),
+        )
+        with self.assertRaises(TypeError):
+            table[0]["code"] = "OTHER"
+
+        # The overriding test replaces the pattern of the base test
+        drop_table = next(test for test in table if test["code"] == "DROP_TABLE")
+        self.assertEqual("transaction", drop_table["mode"])
+        self.assertIsNone(drop_table["pattern"])
+        self.assertEqual("DROPPING table", drop_table["msg"])
+
+    def test_scan(self):
+        analyser = PostgresqlAnalyser(None)
+        self.assertEqual(
+            [],
+            [test["code"] for test in analyser.scan('CREATE TABLE "a" ("id" int);')],
+        )
+        self.assertEqual(
+            ["DROP_COLUMN", "DROP_INDEX"],
+            [
+                test["code"]
+                for test in analyser.scan(
+                    'ALTER TABLE "a" DROP COLUMN "b"; DROP INDEX "c";'
+                )
+            ],
+        )
+
+        # Patterns can refer to their groups by number
+        class BackreferenceAnalyser(BaseAnalyser):
+            migration_tests = [
+                {
+                    "code": "SAME_NAME",
+                    "pattern": r'TABLE "(\w+)" RENAME TO "\1"',
+                    "msg": "RENAMING table to the same name",
+                    "mode": "one_liner",
+                    "type": "error",
+                },
+            ]
+
+        self.assertEqual(
+            ["RENAME_TABLE", "SAME_NAME"],
+            [
+                test["code"]
+                for test in BackreferenceAnalyser(None).scan(
+                    'ALTER TABLE "a" RENAME TO "a";'
+                )
+            ],
+        )
+
+    def test_keyword_dispatch(self):
+        self.assertIn("DROP COLUMN", PostgresqlAnalyser.keywords)
+        self.assertEqual((), PostgresqlAnalyser.get_dispatch(()))
+
+        tests = PostgresqlAnalyser.get_dispatch(("DROP COLUMN", "DROP INDEX"))
+        self.assertEqual(
+            ["DROP_COLUMN", "DROP_INDEX"], [test["code"] for test in tests]
+        )
+        self.assertIs(
+            tests,
+            PostgresqlAnalyser.get_dispatch(("DROP COLUMN", "DROP INDEX")),
+        )
+
+        # Tests without keywords apply to all statements
+        class CustomAnalyser(BaseAnalyser):
+            migration_tests = [
+                {
+                    "code": "TRUNCATE",
+                    "pattern": "^TRUNCATE",
+                    "msg": "TRUNCATING table",
+                    "mode": "one_liner",
+                    "type": "error",
+                },
+            ]
+
+        tests = CustomAnalyser.get_dispatch(())
+        self.assertEqual(["TRUNCATE"], [test["code"] for test in tests])
+
+    def test_custom_migration_tests(self):
+        class CustomAnalyser(BaseAnalyser):
+            migration_tests = [
+                {
+                    "code": "TRUNCATE",
+                    "pattern": "^TRUNCATE",
+                    "msg": "TRUNCATING table",
+                    "mode": "one_liner",
+                    "type": "error",
+                },
+                {
+                    "code": "DROP_COLUMN",
+                    "fn": lambda sql, **kw: "DROP COLUMN" in sql and "tmp_" not in sql,
+                },
+            ]
+
+        errors, _, _ = analyse_sql_statements(
+            CustomAnalyser,
+            [
+                'TRUNCATE "some_table";',
+                'ALTER TABLE "some_table" DROP COLUMN "tmp_column";',
+            ],
+        )
+        self.assertEqual(["TRUNCATE"], [error["code"] for error in errors])
+
+        with self.assertRaises(ValueError):
+
+            class InvalidAnalyser(BaseAnalyser):
+                migration_tests = [
+                    {"code": "NOTHING", "mode": "transaction", "type": "error"}
+                ]
+
+
+class ReusedAnalyserTestCase(unittest.TestCase):
+    def test_analyse_with_same_instance(self):
+        analyser = PostgresqlAnalyser(["DROP_COLUMN"])
+        result = analyse_sql_statements(
+            analyser,
+            [
+                'ALTER TABLE "a" DROP COLUMN "b";',
+                'ALTER TABLE "a" ALTER COLUMN "c" SET NOT NULL;',
+            ],
+        )
+        errors, ignored, warnings = result
+        self.assertEqual(["NOT_NULL"], [error["code"] for error in errors])
+        self.assertEqual(["DROP_COLUMN"], [finding["code"] for finding in ignored])
+        self.assertEqual([], warnings)
+
+        # The findings of the previous analysis are not carried over
+        other_result = analyser.analyse(['DROP INDEX "c";'])
+        self.assertEqual([], other_result.errors)
+        self.assertEqual([], other_result.ignored)
+        self.assertEqual(["DROP_INDEX"], [w["code"] for w in other_result.warnings])
+        self.assertEqual(["NOT_NULL"], [error["code"] for error in result.errors])
+
+        analyser.reset()
+        self.assertEqual(
+            ([], [], []), (analyser.errors, analyser.ignored, analyser.warnings)
+        )
+
+
+class StatementTestCase(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(
+            [
+                ("word", "ALTER"),
+                ("word", "TABLE"),
+                ("name", 'a"b'),
+                ("word", "ALTER"),
+                ("word", "COLUMN"),
+                ("name", "c"),
+                ("word", "SET"),
+                ("word", "DEFAULT"),
+                ("string", "'NOT NULL'"),
+                ("symbol", ";"),
+            ],
+            tokenize(
+                'ALTER TABLE "a""b" /* comment */ ALTER COLUMN `c` '
+                "SET DEFAULT 'NOT NULL'; -- comment"
+            ),
+        )
+        # MySQL escapes quotes with backslashes
+        self.assertEqual(
+            ["'it\\'s'", ";"],
+            [token.value for token in tokenize("'it\\'s';", "mysql")],
+        )
+
+    def test_split_sql_statements(self):
+        sql = (
+            "CREATE FUNCTION f() RETURNS trigger AS $body$\n"
+            "BEGIN NEW.a := 'x;'; RETURN NEW; END;\n"
+            "$body$ LANGUAGE plpgsql;\n"
+            "-- Comment; not a statement\n"
+            "DROP FUNCTION f;"
+        )
+        statements = list(split_sql_statements(sql, "postgresql"))
+        self.assertEqual(2, len(statements))
+        self.assertTrue(statements[0].endswith("LANGUAGE plpgsql;"))
+        self.assertEqual("DROP FUNCTION f;", statements[1])
+
+        # MySQL escapes quotes with backslashes
+        self.assertEqual(
+            ["SELECT 'a\\';b';", "SELECT 2;"],
+            list(split_sql_statements("SELECT 'a\\';b'; SELECT 2;", "mysql")),
+        )
+
+    def test_alter_table(self):
+        statement = Statement(
+            'ALTER TABLE "app_a" ALTER COLUMN "col" SET NOT NULL;', "postgresql"
+        )
+        self.assertEqual("ALTER", statement.verb)
+        self.assertEqual("TABLE", statement.object_type)
+        self.assertEqual("app_a", statement.table)
+        self.assertEqual("ALTER COLUMN", statement.action)
+        self.assertEqual("col", statement.column)
+        self.assertEqual({"NOT NULL"}, statement.flags)
+
+        statement = Statement(
+            "ALTER TABLE `app_a` ADD CONSTRAINT `uniq` UNIQUE (`b`, `c`);", "mysql"
+        )
+        self.assertEqual("ADD CONSTRAINT", statement.action)
+        self.assertEqual("UNIQUE", statement.constraint)
+        self.assertIsNone(statement.column)
+
+        statement = Statement("ALTER TABLE `app_a` MODIFY `col` integer NULL;")
+        self.assertEqual(("MODIFY", "col"), (statement.action, statement.column))
+
+        statement = Statement('ALTER TABLE "new__a" RENAME TO "a";', "sqlite")
+        self.assertEqual(("RENAME TO", "a"), (statement.action, statement.new_name))
+
+        statement = Statement(
+            "ALTER TABLE `a` ADD COLUMN `x` integer DEFAULT (1, 2) NULL, "
+            "MODIFY `y` integer NOT NULL, DROP INDEX `z`;",
+            "mysql",
+        )
+        self.assertEqual(("ADD COLUMN", "x"), (statement.action, statement.column))
+        self.assertEqual(
+            (
+                ("ADD COLUMN", "x", {"DEFAULT"}),
+                ("MODIFY", "y", {"NOT NULL"}),
+                ("DROP INDEX", None, set()),
+            ),
+            statement.alterations,
+        )
+        self.assertEqual(("x", "y"), statement.columns)
+        self.assertEqual({"NOT NULL"}, statement.column_flags["y"])
+
+    def test_create(self):
+        statement = Statement(
+            'CREATE TABLE "a" ("id" integer NOT NULL PRIMARY KEY, '
+            '"b" varchar(10) DEFAULT \'x\' NOT NULL, "c" integer NULL, '
+            'CONSTRAINT "u" UNIQUE ("b", "c"));'
+        )
+        self.assertTrue(statement.is_create_table("a"))
+        self.assertEqual(("id", "b", "c"), statement.columns)
+        self.assertEqual({"NOT NULL", "PRIMARY KEY"}, statement.column_flags["id"])
+        self.assertEqual({"NOT NULL", "DEFAULT"}, statement.column_flags["b"])
+        self.assertEqual(set(), statement.column_flags["c"])
+
+        statement = Statement(
+            "CREATE UNIQUE INDEX CONCURRENTLY idx ON films (title, (lower(b)));"
+        )
+        self.assertEqual(("INDEX", "films"), (statement.object_type, statement.table))
+        self.assertEqual(("title",), statement.columns)
+        self.assertEqual({"UNIQUE", "CONCURRENTLY"}, statement.flags)
+
+    def test_error_table_and_column(self):
+        errors, _, _ = analyse_sql_statements(
+            get_sql_analyser_class("mysql"),
+            ["ALTER TABLE `app_a` CHANGE `old` `new` integer NULL;"],
+        )
+        self.assertEqual(
+            [("RENAME_COLUMN", "app_a", "old")],
+            [(error["code"], error["table"], error["column"]) for error in errors],
+        )
+
+    def test_migration_test_findings(self):
+        class Analyser(PostgresqlAnalyser):
+            migration_tests = [
+                {
+                    "code": "FINDALL",
+                    "fn": lambda sql, **kw: re.findall(r"\d+", sql),
+                    "msg": "Numbers",
+                    "mode": "one_liner",
+                    "type": "error",
+                },
+                {
+                    "code": "FINDINGS",
+                    "fn": lambda sql, **kw: [Finding("a", "x"), Finding("b", None)],
+                    "msg": "Findings",
+                    "mode": "transaction",
+                    "type": "error",
+                },
+            ]
+
+            @staticmethod
+            def detect_column(sql):
+                return "detected"
+
+        errors, _, _ = analyse_sql_statements(
+            Analyser, ['ALTER TABLE "app_a" ALTER COLUMN "col" TYPE varchar(10);']
+        )
+        self.assertEqual(
+            [
+                ("ALTER_COLUMN", "app_a", "detected"),
+                ("FINDALL", "app_a", "detected"),
+                ("FINDINGS", "a", "x"),
+                ("FINDINGS", "b", None),
+            ],
+            [(error["code"], error["table"], error["column"]) for error in errors],
+        )
@@ -0,0 +1,234 @@
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from django.db import connections
+from django.db.migrations import Migration
+from django.db.migrations.loader import MigrationLoader
+
+from django_migration_linter import MigrationLinter, get_migration_abspath
+from django_migration_linter.cache import ProjectStateCheckpoints
+from django_migration_linter.sql_generator import SqlGenerator
+
+
+def get_migration_hash(app_label, migration_name):
+    return MigrationLinter.get_file_hash(
+        get_migration_abspath(app_label, migration_name)
+    )
+
+
+class SqlGeneratorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loader = MigrationLoader(connections["default"])
+
+    def get_sql_generator(self):
+        return SqlGenerator(self.loader, connections["default"])
+
+    def test_get_sql(self):
+        sql_statements = self.get_sql_generator().get_sql(
+            "app_add_not_null_column", "0001"
+        )
+        self.assertEqual(sql_statements[0], "BEGIN;")
+        self.assertEqual(sql_statements[-1], "COMMIT;")
+        self.assertTrue(any(sql.startswith("CREATE TABLE") for sql in sql_statements))
+
+    def test_app_state_is_reused(self):
+        sql_generator = self.get_sql_generator()
+        sql_generator.get_sql("app_add_not_null_column", "0001_create_table")
+
+        with mock.patch.object(
+            sql_generator, "build_state", wraps=sql_generator.build_state
+        ) as build_state_mock:
+            sql_statements = sql_generator.get_sql(
+                "app_add_not_null_column", "0002_add_new_not_null_field"
+            )
+            build_state_mock.assert_not_called()
+
+        self.assertTrue(
+            any(
+                sql.startswith("ALTER TABLE") or sql.startswith("CREATE TABLE")
+                for sql in sql_statements
+            )
+        )
+
+    def test_app_state_not_reused_for_non_ancestor(self):
+        sql_generator = self.get_sql_generator()
+        sql_generator.get_sql("app_data_migrations", "0003_incorrect_arguments")
+
+        with mock.patch.object(
+            sql_generator, "build_state", wraps=sql_generator.build_state
+        ) as build_state_mock:
+            sql_generator.get_sql("app_data_migrations", "0002_missing_reverse")
+            build_state_mock.assert_called_once()
+
+    def test_generate(self):
+        nodes = [
+            ("app_add_not_null_column", "0002_add_new_not_null_field"),
+            ("app_add_not_null_column", "0001_create_table"),
+            ("app_correct", "0002_foo"),
+            ("app_correct", "0001_initial"),
+        ]
+        sql_generator = self.get_sql_generator()
+        self.assertEqual(sorted(nodes), sql_generator.get_ancestors(nodes))
+
+        sql_generator.generate(nodes)
+        self.assertFalse(sql_generator.app_states)
+
+        # Generating them one by one follows the same path in the graph
+        other_sql_generator = self.get_sql_generator()
+        for app_label, migration_name in sorted(nodes):
+            self.assertEqual(
+                other_sql_generator.get_sql(app_label, migration_name),
+                sql_generator.get_sql(app_label, migration_name),
+            )
+        self.assertFalse(sql_generator.generated_sql)
+
+    def test_build_common_state(self):
+        nodes = [
+            ("admin", "0001_initial"),
+            ("auth", "0002_alter_permission_name_max_length"),
+        ]
+        sql_generator = self.get_sql_generator()
+        ancestors = sql_generator.get_ancestors(nodes)
+        self.assertIn(("auth", "0001_initial"), ancestors)
+        self.assertLess(
+            ancestors.index(("contenttypes", "0001_initial")),
+            ancestors.index(("auth", "0001_initial")),
+        )
+
+        state, applied = sql_generator.build_common_state(nodes, ancestors)
+        self.assertEqual(
+            {("contenttypes", "0001_initial"), ("auth", "0001_initial")}, applied
+        )
+        self.assertIn(("auth", "user"), state.models)
+        self.assertNotIn(("admin", "logentry"), state.models)
+
+        self.assertIsNone(sql_generator.build_common_state(nodes[:1], ancestors))
+
+    def test_generate_from_common_state(self):
+        nodes = [
+            ("admin", "0001_initial"),
+            ("auth", "0002_alter_permission_name_max_length"),
+        ]
+        sql_generator = self.get_sql_generator()
+        sql_generator.generate(nodes)
+        self.assertIsNone(sql_generator.common_state)
+
+        for app_label, migration_name in nodes:
+            self.assertEqual(
+                self.get_sql_generator().get_sql(app_label, migration_name),
+                sql_generator.get_sql(app_label, migration_name),
+            )
+
+    def test_generate_from_other_app_state(self):
+        nodes = sorted(
+            node for node in self.loader.graph.nodes if node[0] in ("admin", "auth")
+        )
+        sql_generator = self.get_sql_generator()
+        ancestors = sql_generator.get_ancestors(nodes)
+
+        # The admin app starts from the state of the auth app: the ancestors
+        # that are not generated are applied once
+        with mock.patch.object(
+            Migration, "mutate_state", autospec=True, side_effect=Migration.mutate_state
+        ) as mutate_state_mock:
+            sql_generator.generate(nodes)
+        self.assertEqual(len(ancestors) - len(nodes), mutate_state_mock.call_count)
+
+    @mock.patch("django_migration_linter.sql_generator.MAX_PROJECT_STATES", 1)
+    def test_max_project_states(self):
+        sql_generator = self.get_sql_generator()
+        sql_generator.get_sql("app_add_not_null_column", "0001_create_table")
+        sql_generator.get_sql("app_correct", "0001_initial")
+        self.assertEqual(["app_correct"], list(sql_generator.app_states))
+
+    @mock.patch(
+        "django_migration_linter.sql_generator.PROJECT_STATE_CHECKPOINT_INTERVAL", 1
+    )
+    def test_resume_from_state_checkpoint(self):
+        node = ("app_add_not_null_column", "0002_add_new_not_null_field")
+        with tempfile.TemporaryDirectory() as cache_path:
+            sql_generator = SqlGenerator(
+                self.loader,
+                connections["default"],
+                state_checkpoints=ProjectStateCheckpoints(cache_path),
+                get_migration_hash=get_migration_hash,
+            )
+            sql_generator.get_sql("app_add_not_null_column", "0001_create_table")
+            sql_generator.get_sql(*node)
+            key = sql_generator.get_state_key(
+                ("app_add_not_null_column", "0001_create_table")
+            )
+            self.assertIn(key, sql_generator.state_checkpoints)
+            self.assertNotEqual(key, sql_generator.get_state_key(node))
+
+            sql_generator = SqlGenerator(
+                self.loader,
+                connections["default"],
+                state_checkpoints=ProjectStateCheckpoints(cache_path),
+                get_migration_hash=get_migration_hash,
+            )
+            self.assertIn(key, sql_generator.state_checkpoints)
+            expected_sql_statements = self.get_sql_generator().get_sql(*node)
+            with mock.patch.object(
+                self.loader.graph.nodes[
+                    ("app_add_not_null_column", "0001_create_table")
+                ],
+                "mutate_state",
+            ) as mutate_state_mock:
+                self.assertEqual(expected_sql_statements, sql_generator.get_sql(*node))
+                mutate_state_mock.assert_not_called()
+
+    def test_sql_cache(self):
+        node = ("app_add_not_null_column", "0002_add_new_not_null_field")
+        sql_cache = {}
+        sql_generator = SqlGenerator(
+            self.loader,
+            connections["default"],
+            sql_cache=sql_cache,
+            get_migration_hash=get_migration_hash,
+        )
+        sql_statements = sql_generator.get_sql(*node)
+        key = sql_generator.get_sql_key(node)
+        self.assertEqual({key: sql_statements}, sql_cache)
+        self.assertNotEqual(
+            key,
+            sql_generator.get_sql_key(("app_add_not_null_column", "0001_create_table")),
+        )
+
+        sql_generator = SqlGenerator(
+            self.loader,
+            connections["default"],
+            sql_cache=sql_cache,
+            get_migration_hash=get_migration_hash,
+        )
+        with mock.patch.object(sql_generator, "collect_sql") as collect_sql_mock:
+            sql_generator.generate([node])
+            self.assertEqual(sql_statements, sql_generator.get_sql(*node))
+            collect_sql_mock.assert_not_called()
+
+    def test_compute_state_keys(self):
+        nodes = [
+            ("app_add_not_null_column", "0002_add_new_not_null_field"),
+            ("app_add_not_null_column", "0001_create_table"),
+        ]
+        get_migration_hash_mock = mock.Mock(wraps=get_migration_hash)
+        sql_generator = SqlGenerator(
+            self.loader,
+            connections["default"],
+            get_migration_hash=get_migration_hash_mock,
+        )
+        sql_generator.compute_state_keys(nodes)
+        self.assertEqual(set(nodes), set(sql_generator.state_keys))
+        self.assertEqual(2, get_migration_hash_mock.call_count)
+
+        # The key of a migration depends on the keys of its ancestors
+        key = sql_generator.get_state_key(nodes[0])
+        sql_generator.state_keys = {}
+        get_migration_hash_mock.side_effect = lambda app_label, migration_name: (
+            "modified"
+            if migration_name == "0001_create_table"
+            else get_migration_hash(app_label, migration_name)
+        )
+        self.assertNotEqual(key, sql_generator.get_state_key(nodes[0]))
+        self.assertEqual(4, get_migration_hash_mock.call_count)
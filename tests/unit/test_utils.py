@@ -1,6 +1,16 @@
+import os
+import subprocess
+import tempfile
 import unittest
 
-from django_migration_linter.utils import split_migration_path, split_path
+from django_migration_linter import MigrationLinter
+from django_migration_linter.utils import (
+    get_git_blob_ids,
+    get_migration_abspath,
+    get_migration_paths,
+    split_migration_path,
+    split_path,
+)
 
 
 class SplitPathTestCase(unittest.TestCase):
@@ -41,3 +51,45 @@ class SplitPathTestCase(unittest.TestCase):
         app, mig = split_migration_path(input_path)
         self.assertEqual(app, "the_app")
         self.assertEqual(mig, "0001_stuff")
+
+
+class MigrationPathsTestCase(unittest.TestCase):
+    def test_get_migration_paths(self):
+        migration_paths = get_migration_paths("app_add_not_null_column")
+        self.assertEqual(
+            {"0001_create_table", "0002_add_new_not_null_field"}, set(migration_paths)
+        )
+        for migration_name, path in migration_paths.items():
+            self.assertEqual(
+                get_migration_abspath("app_add_not_null_column", migration_name), path
+            )
+
+
+class GitBlobIdsTestCase(unittest.TestCase):
+    def test_get_git_blob_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # The app is next to the directory of the settings, not inside it
+            settings_path = os.path.join(directory, "project")
+            migration_path = os.path.join(directory, "app", "migrations", "0001.py")
+            modified_path = os.path.join(directory, "app", "migrations", "0002.py")
+            os.makedirs(settings_path)
+            os.makedirs(os.path.dirname(migration_path))
+            for path in (migration_path, modified_path):
+                with open(path, "w") as f:
+                    f.write("operations = []\n")
+            try:
+                subprocess.check_call(["git", "init", "-q"], cwd=directory)
+                subprocess.check_call(["git", "add", "."], cwd=directory)
+            except (OSError, subprocess.CalledProcessError):
+                self.skipTest("git is not available")
+            with open(modified_path, "a") as f:
+                f.write("# Modified\n")
+
+            self.assertEqual(
+                {migration_path: MigrationLinter.get_file_hash(migration_path)},
+                get_git_blob_ids(settings_path),
+            )
+
+    def test_get_git_blob_ids_outside_checkout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual({}, get_git_blob_ids(directory))